@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Iterable, Optional, Set
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models.document_model import IndexedDocument
+
+logger = logging.getLogger(__name__)
+
+def query_weaviate_hashes(weaviate_client, hashes: Set[str]) -> Set[str]:
+    """
+    Une seule requête Weaviate pour tout un lot : agrégat groupé par hash, filtré sur les hashes recherchés.
+    """
+    result = weaviate_client.query.aggregate("AO") \
+        .with_group_by_filter(["hash"]) \
+        .with_fields("groupedBy { value }") \
+        .with_where({"path": ["hash"], "operator": "ContainsAny", "valueTextArray": sorted(hashes)}) \
+        .do()
+    groups = result.get("data", {}).get("Aggregate", {}).get("AO", []) or []
+    return {group["groupedBy"]["value"] for group in groups}
+
+async def find_indexed_hashes(hashes: Iterable[str], db: AsyncSession, weaviate_client) -> Set[str]:
+    """
+    Retourne, parmi `hashes`, ceux déjà indexés.
+    Consulte d'abord le registre local ; seuls les hashes inconnus localement sont vérifiés
+    dans Weaviate, en une requête pour tout le lot, et les hashes trouvés sont ajoutés au registre.
+    """
+    hashes = set(hashes)
+    if not hashes:
+        return set()
+
+    result = await db.execute(select(IndexedDocument.hash).where(IndexedDocument.hash.in_(hashes)))
+    known = set(result.scalars().all())
+
+    unknown = hashes - known
+    if unknown:
+        remote = await asyncio.to_thread(query_weaviate_hashes, weaviate_client, unknown)
+        if remote:
+            # Documents indexés avant la mise en place du registre : on resynchronise
+            for file_hash in remote:
+                await db.merge(IndexedDocument(hash=file_hash))
+            await db.commit()
+            logger.info(f"🔄 {len(remote)} hash(es) rapatrié(s) depuis Weaviate dans le registre local")
+        known |= remote
+
+    return known
+
+async def register_document(db: AsyncSession, file_hash: str, source: str, workspace_id: str, confidentiality, chunk_count: int):
+    """
+    Enregistre un document après son indexation dans Weaviate.
+    """
+    await db.merge(IndexedDocument(
+        hash=file_hash,
+        source=source,
+        workspace_id=workspace_id,
+        confidentiality=getattr(confidentiality, "value", confidentiality),
+        chunk_count=chunk_count
+    ))
+    await db.commit()
+
+async def find_previous_version(db: AsyncSession, source: str, workspace_id: str, exclude_hash: str = None) -> Optional[IndexedDocument]:
+    """
+    Dernière version indexée d'un même document (même nom de fichier, même workspace), s'il y en a une.
+    """
+    query = select(IndexedDocument).where(IndexedDocument.source == source, IndexedDocument.workspace_id == workspace_id)
+    if exclude_hash is not None:
+        query = query.where(IndexedDocument.hash != exclude_hash)
+    result = await db.execute(query.order_by(IndexedDocument.indexed_at.desc()).limit(1))
+    return result.scalars().first()
+
+async def unregister_document(db: AsyncSession, file_hash: str):
+    """
+    Retire un document du registre (ex. version remplacée dont les chunks ont été supprimés).
+    """
+    document = await db.get(IndexedDocument, file_hash)
+    if document is not None:
+        await db.delete(document)
+        await db.commit()
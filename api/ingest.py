@@ -1,95 +1,227 @@
 from fastapi import APIRouter, Request, UploadFile, File, Depends, Form
 from .auth import require_admin_role
-from rag.loader import load_document_with_hash, index_documents, split_documents
+from .dedup import find_indexed_hashes, register_document, find_previous_version, unregister_document
+from rag.loader import extract_sections, hash_sections, match_reused_sections, summarize_changed_sections, merge_reused_chunks, index_documents, split_sections
+from rag.upload import spool_upload
 from shared.enums import ConfidentialityLevel
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import nullcontext
 from typing import List
+import asyncio
+import logging
 import os
-import tempfile
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def sauvegarder_resume(filename: str, sections_resumees: list):
+    # 💾 Sauvegarder le résumé balisé brut dans un fichier, section par section
+    filename_base = os.path.splitext(filename)[0]
+    resume_dir = "resumes"
+    os.makedirs(resume_dir, exist_ok=True)
+    resume_balisé_path = os.path.join(resume_dir, f"{filename_base}_resume_balisé.txt")
+    with open(resume_balisé_path, "w", encoding="utf-8") as f:
+        f.writelines(f"# {titre}\n\n{resume}\n\n{'=' * 80}\n\n" for titre, resume in sections_resumees)
+
+async def _no_report(stage: str, progress: float):
+    pass
+
+def _no_limit(stage: str):
+    return nullcontext()
+
+# Marqueur de fin de flux entre deux étapes du pipeline
+_FIN = object()
+
+async def _etape(entree: asyncio.Queue, sortie, traiter, workers: int, workers_suivants: int):
+    """
+    Étape du pipeline : `workers` tâches consomment `entree`, appliquent `traiter` et poussent
+    le résultat (sauf None) dans `sortie`. Une file pleine bloque l'étape amont (mémoire bornée).
+    Quand tous les workers ont reçu la fin de flux, elle est transmise à l'étape suivante.
+    """
+    async def worker():
+        while True:
+            item = await entree.get()
+            if item is _FIN:
+                return
+            resultat = await traiter(item)
+            if resultat is not None and sortie is not None:
+                await sortie.put(resultat)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if sortie is not None:
+        for _ in range(workers_suivants):
+            await sortie.put(_FIN)
+
+async def ingest_files(app, uploads: list, workspace_id: str, confidentiality: ConfidentialityLevel, db: AsyncSession, report=_no_report, stage_limit=_no_limit) -> dict:
+    """
+    Ingestion d'un lot de fichiers reçus : doublons, puis pipeline extraction → résumés → découpage → indexation.
+
+    Les étapes tournent en parallèle, reliées par des files bornées : l'extraction (CPU) du fichier
+    suivant avance pendant les résumés (LLM) du précédent, et chaque fichier est indexé dès qu'il est
+    découpé. Au plus `app.state.pipeline_queue_size` fichiers extraits attendent leur résumé et
+    `app.state.indexing_window` fichiers découpés leur indexation : la mémoire dépend de quelques
+    fichiers et non du lot entier. Nombre de workers par étape : `app.state.pipeline_workers`.
+
+    - `report(stage, progress)` est appelé à chaque étape franchie (progress entre 0 et 1) ;
+    - `stage_limit(stage)` renvoie le limiteur de concurrence (async context manager) de l'étape.
+    """
+    vectorstore = app.state.vectorstore
+    already_indexed = []
+    indexed_files = []
+    failed_files = []
+    total_chunks = 0
+
+    # dedup + (extract, summarize, split, index) par fichier
+    total_steps = 4 * len(uploads) + 1
+    done_steps = 0
+
+    async def step(stage: str, count: int = 1):
+        nonlocal done_steps
+        done_steps += count
+        await report(stage, done_steps / total_steps)
+
+    # La session est partagée par les étapes du pipeline : accès sérialisés
+    db_lock = asyncio.Lock()
+
+    async def extraire(upload):
+        # Flux de blocs du handler (titres balisés) regroupé en sections, puis hash de chaque section
+        try:
+            async with stage_limit("extract"):
+                sections = await extract_sections(upload.filename, upload, app.state.extraction_executor)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'extraction du fichier {upload.filename} : {e}")
+            failed_files.append(upload.filename)
+            # Les étapes restantes du fichier sont comptées comme franchies
+            await step("extract", 4)
+            return None
+        await step("extract")
+        return upload, sections, hash_sections(sections)
+
+    async def resumer(item):
+        upload, sections, section_hashes = item
+
+        # Version précédente du même document : ses sections inchangées sont reprises telles quelles
+        async with db_lock:
+            previous = await find_previous_version(db, upload.filename, workspace_id, exclude_hash=upload.sha256)
+        previous_hash = previous.hash if previous is not None else None
+        reused = {}
+        try:
+            if previous_hash is not None:
+                fetched = await asyncio.to_thread(app.state.indexer.fetch_section_chunks, previous_hash, set(section_hashes))
+                reused = match_reused_sections(section_hashes, fetched)
+                logger.info(f"♻️ {upload.filename} : {len(reused)}/{len(sections)} section(s) inchangée(s) depuis la version précédente")
+
+            async with stage_limit("summarize"):
+                sections_resumees = await summarize_changed_sections(sections, set(reused), app.state.llm, app.state.summary_concurrency, app.state.summary_cache, app.state.summary_semaphore)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du résumé du fichier {upload.filename} : {e}")
+            failed_files.append(upload.filename)
+            await step("summarize", 3)
+            return None
+        await step("summarize")
+
+        sauvegarder_resume(upload.filename, sections_resumees)
+
+        # Découpage en tokens (tokenizers HF) lié au CPU : hors de la boucle d'événements
+        chunks = await asyncio.to_thread(lambda: list(split_sections(sections_resumees, upload.filename, upload.sha256, workspace_id, confidentiality, section_hashes=section_hashes, chunker=app.state.chunker)))
+        chunks, vectors = merge_reused_chunks(chunks, reused, sections, upload.filename, upload.sha256, workspace_id, confidentiality)
+        await step("split")
+        return upload, chunks, vectors, previous_hash
+
+    async def indexer(item):
+        nonlocal total_chunks
+        upload, chunks, vectors, previous_hash = item
+        async with stage_limit("index"):
+            indexing = await asyncio.to_thread(index_documents, chunks, vectorstore, app.state.indexer, vectors)
+            if indexing["status"] != "ok":
+                # Document incomplet (chunks rejetés, échec d'embedding après des lots déjà écrits) : ses chunks
+                # sont retirés, sinon la détection de doublons le verrait dans Weaviate et refuserait de le réingérer
+                await asyncio.to_thread(app.state.indexer.delete_by_hashes, [upload.sha256])
+            elif previous_hash is not None:
+                # Nouvelle version indexée : suppression en masse des chunks de la version remplacée
+                await asyncio.to_thread(app.state.indexer.delete_by_hashes, [previous_hash])
+
+        if indexing["status"] != "ok":
+            logger.error(f"❌ Indexation de {upload.filename} en échec : {indexing.get('message', indexing['status'])}")
+            failed_files.append(upload.filename)
+        else:
+            async with db_lock:
+                if previous_hash is not None:
+                    await unregister_document(db, previous_hash)
+                await register_document(db, upload.sha256, upload.filename, workspace_id, confidentiality, len(chunks))
+            app.state.answer_cache.invalidate_workspace(workspace_id)
+            app.state.title_cache.invalidate_source(upload.filename)
+            indexed_files.append(upload.filename)
+            total_chunks += len(chunks)
+        await step("index")
+
+    # Une seule vérification de doublons pour tout le lot
+    await report("dedup", 0.0)
+    async with stage_limit("dedup"):
+        async with db_lock:
+            indexed_hashes = await find_indexed_hashes({upload.sha256 for upload in uploads}, db, vectorstore._client)
+    await step("dedup")
+
+    workers = app.state.pipeline_workers
+    a_extraire = asyncio.Queue()
+    for upload in uploads:
+        if upload.sha256 in indexed_hashes:
+            already_indexed.append(upload.filename)
+            await step("dedup", 4)
+            continue
+        # Même fichier envoyé deux fois dans le lot
+        indexed_hashes.add(upload.sha256)
+        a_extraire.put_nowait(upload)
+    for _ in range(workers["extract"]):
+        a_extraire.put_nowait(_FIN)
+
+    a_resumer = asyncio.Queue(maxsize=app.state.pipeline_queue_size)
+    a_indexer = asyncio.Queue(maxsize=app.state.indexing_window)
+    etapes = [
+        asyncio.create_task(_etape(a_extraire, a_resumer, extraire, workers["extract"], workers["summarize"])),
+        asyncio.create_task(_etape(a_resumer, a_indexer, resumer, workers["summarize"], workers["index"])),
+        asyncio.create_task(_etape(a_indexer, None, indexer, workers["index"], 0))
+    ]
+    try:
+        await asyncio.gather(*etapes)
+    finally:
+        # Erreur inattendue dans une étape : les autres sont arrêtées plutôt que bloquées sur une file
+        for tache in etapes:
+            tache.cancel()
+
+    return {
+        "message": f"{len(indexed_files)} documents indexés avec succès",
+        "indexed_files": indexed_files,
+        "already_indexed": already_indexed,
+        "failed_files": failed_files,
+        "total_chunks_indexed": total_chunks
+    }
 
 @router.post("/ingest")
 async def ingest_document(request: Request, file: UploadFile = File(...), workspace_id: str = Form(...), confidentiality: ConfidentialityLevel = Form(...), token: str = Depends(require_admin_role)):
     try:
-        contents = await file.read()
-
-        temp_dir = tempfile.gettempdir()
-        temp_file_path = os.path.join(temp_dir, file.filename)
-
-        with open(temp_file_path, "wb") as f:
-            f.write(contents)
-
-        vectorstore = request.app.state.vectorstore
-        llm = request.app.state.llm
-
-        result = await load_document_with_hash(file.filename, contents, workspace_id, confidentiality, vectorstore, llm)
-        if result is None:
-            os.remove(temp_file_path)
-            return {"message": f"❌ Document déjà indexé : {file.filename}"}
-
-        texte_résumé_balisé, source, hash, workspace_id, confidentiality = result
-
-        # 💾 Sauvegarder le résumé balisé brut dans un fichier
-        filename_base = os.path.splitext(file.filename)[0]
-        resume_dir = "resumes"
-        os.makedirs(resume_dir, exist_ok=True)
-        resume_balisé_path = os.path.join(resume_dir, f"{filename_base}_resume_balisé.txt")
-        with open(resume_balisé_path, "w", encoding="utf-8") as f:
-            f.write(texte_résumé_balisé)
-
-        chunks = split_documents(texte_résumé_balisé, source, hash, workspace_id, confidentiality)
-        index_documents(chunks=chunks, vectorstore=vectorstore)
-
-        os.remove(temp_file_path)
-
-        return {
-            "message": "✅ Document indexé avec succès",
-            "chunks_indexed": len(chunks)
-        }
+        # Réception par blocs (mémoire bornée, SHA-256 incrémental), puis traitement en arrière-plan
+        upload = await spool_upload(file)
+        job_id = await request.app.state.job_queue.submit([upload], workspace_id, confidentiality)
+        return {"message": "📥 Ingestion planifiée", "job_id": job_id, "status_url": f"/jobs/{job_id}"}
 
     except Exception as e:
         return {"message": f"Erreur : {str(e)}"}
  
 @router.post("/ingests")
 async def ingest_multiple_documents(request: Request, files: List[UploadFile] = File(...), workspace_id: str = Form(...), confidentiality: ConfidentialityLevel = Form(...), token: str = Depends(require_admin_role)):
-    all_chunks = []
-    already_indexed = []
-    indexed_files = []
-
+    uploads = []
     try:
-        vectorstore = request.app.state.vectorstore
-        llm = request.app.state.llm
+        # Réception par blocs de tous les fichiers, puis traitement du lot en arrière-plan
         for file in files:
-            contents = await file.read()
-
-            result = await load_document_with_hash(file.filename, contents, workspace_id, confidentiality, vectorstore, llm)
-            if result is None:
-                already_indexed.append(file.filename)
-                continue
-
-            texte_résumé_balisé, source, hash, workspace_id, confidentiality = result
-
-            # 💾 Sauvegarder le résumé balisé brut dans un fichier
-            filename_base = os.path.splitext(file.filename)[0]
-            resume_dir = "resumes"
-            os.makedirs(resume_dir, exist_ok=True)
-            resume_balisé_path = os.path.join(resume_dir, f"{filename_base}_resume_balisé.txt")
-            with open(resume_balisé_path, "w", encoding="utf-8") as f:
-                f.write(texte_résumé_balisé)
-
-            chunks = split_documents(texte_résumé_balisé, source, hash, workspace_id, confidentiality)
-            all_chunks.extend(chunks)
-            indexed_files.append(file.filename)
-
-        if all_chunks:
-            index_documents(chunks=all_chunks, vectorstore=vectorstore)
-
-        return {
-            "message": f"{len(indexed_files)} documents indexés avec succès",
-            "indexed_files": indexed_files,
-            "already_indexed": already_indexed,
-            "total_chunks_indexed": len(all_chunks)
-        }
+            uploads.append(await spool_upload(file))
+        job_id = await request.app.state.job_queue.submit(uploads, workspace_id, confidentiality)
+        return {"message": f"📥 Ingestion de {len(uploads)} document(s) planifiée", "job_id": job_id, "status_url": f"/jobs/{job_id}"}
 
     except Exception as e:
-        return {"message": f"Erreur : {str(e)}"}
\ No newline at end of file
+        return {"message": f"Erreur : {str(e)}"}
+    finally:
+        # Échec de réception d'un fichier suivant : les fichiers déjà spoolés sont libérés
+        # (sans effet sur ceux persistés par le job)
+        for upload in uploads:
+            upload.close()
@@ -0,0 +1,187 @@
+from fastapi import APIRouter, Depends, HTTPException
+from .auth import require_admin_role
+from .ingest import ingest_files
+from models.db import AsyncSessionLocal
+from models.document_model import IndexedDocument
+from models.job_model import IngestionJob
+from rag.upload import StoredUpload
+from shared.enums import ConfidentialityLevel
+from sqlalchemy.future import select
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import shutil
+import uuid
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class IngestionJobQueue:
+    """
+    File de jobs d'ingestion traitée en arrière-plan par `workers` tâches asyncio.
+
+    Les jobs et leurs fichiers sont persistés (table `ingestion_jobs`, dossier `storage_dir`) :
+    au redémarrage, les jobs non terminés sont remis en file, après suppression des chunks orphelins
+    laissés par un job interrompu en cours d'indexation. Chaque étape du pipeline
+    (dedup, extract, summarize, index) a sa propre limite de concurrence, partagée par tous les jobs.
+    """
+
+    def __init__(self, app, workers: int = 2, stage_limits: Optional[Dict[str, int]] = None, storage_dir: str = "jobs"):
+        self.app = app
+        self.workers = workers
+        self.stage_limits = {"dedup": 4, "extract": 2, "summarize": 2, "index": 1, **(stage_limits or {})}
+        self.storage_dir = storage_dir
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.stage_limits.items()}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    def stage_limit(self, stage: str):
+        return self._semaphores[stage]
+
+    async def start(self):
+        os.makedirs(self.storage_dir, exist_ok=True)
+
+        # Reprise des jobs interrompus par un arrêt de l'API
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(IngestionJob).where(IngestionJob.status.in_(["queued", "running"])).order_by(IngestionJob.created_at)
+            )
+            pending = result.scalars().all()
+            await self._purge_orphans(db, [job for job in pending if job.status == "running"])
+            for job in pending:
+                job.status, job.stage, job.progress = "queued", None, 0.0
+            await db.commit()
+        for job in pending:
+            self._queue.put_nowait(job.id)
+        if pending:
+            logger.info(f"🔁 {len(pending)} job(s) d'ingestion remis en file")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _purge_orphans(self, db, interrupted: list):
+        """
+        Chunks écrits dans Weaviate par des jobs interrompus, pour des documents jamais enregistrés
+        (l'indexation précède register_document) : invisibles pour le registre, ils seraient
+        dupliqués par la reprise du job. Ils sont supprimés avant la remise en file.
+        """
+        hashes = {f["sha256"] for job in interrupted for f in job.get_files()}
+        if not hashes:
+            return
+        result = await db.execute(select(IndexedDocument.hash).where(IndexedDocument.hash.in_(hashes)))
+        orphans = hashes - set(result.scalars().all())
+        if orphans:
+            await asyncio.to_thread(self.app.state.indexer.delete_by_hashes, orphans)
+            logger.info(f"🧹 Chunks orphelins supprimés pour {len(orphans)} document(s) de job(s) interrompu(s)")
+
+    async def _purge_job(self, job_id: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await db.get(IngestionJob, job_id)
+                if job is not None:
+                    await self._purge_orphans(db, [job])
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} : suppression des chunks orphelins en échec : {e}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, uploads: list, workspace_id: str, confidentiality: ConfidentialityLevel) -> str:
+        """
+        Persiste les fichiers reçus et crée le job ; retourne immédiatement son identifiant.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.storage_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        files = []
+        try:
+            for idx, upload in enumerate(uploads):
+                # Préfixe numérique : deux fichiers homonymes du même lot ne s'écrasent pas
+                path = os.path.join(job_dir, f"{idx}_{os.path.basename(upload.filename)}")
+                stored = upload.persist(path)
+                files.append({"filename": stored.filename, "path": stored.path, "sha256": stored.sha256})
+        finally:
+            for upload in uploads:
+                upload.close()
+
+        async with AsyncSessionLocal() as db:
+            job = IngestionJob(
+                id=job_id,
+                status="queued",
+                progress=0.0,
+                workspace_id=workspace_id,
+                confidentiality=getattr(confidentiality, "value", confidentiality)
+            )
+            job.set_files(files)
+            db.add(job)
+            await db.commit()
+
+        await self._queue.put(job_id)
+        logger.info(f"📥 Job {job_id} créé ({len(files)} fichier(s))")
+        return job_id
+
+    async def _update(self, job_id: str, **fields):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(IngestionJob, job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            await db.commit()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                # Arrêt de l'API en cours de job : les chunks déjà écrits des documents non enregistrés sont retirés
+                await self._purge_job(job_id)
+                raise
+            except Exception as e:
+                logger.error(f"❌ Job {job_id} en échec : {e}")
+                await self._purge_job(job_id)
+                await self._update(job_id, status="failed", error=str(e))
+                shutil.rmtree(os.path.join(self.storage_dir, job_id), ignore_errors=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(IngestionJob, job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return
+            job.status = "running"
+            await db.commit()
+
+            uploads = [StoredUpload(f["path"], f["filename"], f["sha256"]) for f in job.get_files()]
+
+            async def report(stage: str, progress: float):
+                await self._update(job_id, stage=stage, progress=progress)
+
+            result = await ingest_files(
+                self.app,
+                uploads,
+                job.workspace_id,
+                ConfidentialityLevel(job.confidentiality),
+                db,
+                report=report,
+                stage_limit=self.stage_limit
+            )
+
+        await self._update(job_id, status="done", progress=1.0, result=json.dumps(result, ensure_ascii=False))
+        shutil.rmtree(os.path.join(self.storage_dir, job_id), ignore_errors=True)
+        logger.info(f"✅ Job {job_id} terminé")
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, token: str = Depends(require_admin_role)):
+    async with AsyncSessionLocal() as db:
+        job = await db.get(IngestionJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return job.to_dict()
@@ -1,13 +1,21 @@
 from fastapi import FastAPI
-from api import ingest, query, auth, user_manager
-from langchain_ollama import OllamaLLM
+from api import ingest, query, auth, user_manager, jobs
+from langchain_ollama import OllamaEmbeddings, OllamaLLM
 from langchain_community.vectorstores import Weaviate as WeaviateStore
 import weaviate
-from langchain_community.embeddings import OllamaEmbeddings
 from weaviate import Client as WeaviateClient
 from typing import List
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import os
+import asyncio
+import multiprocessing
+from rag.reranker import reranker_registry
+from rag.answer_cache import SemanticAnswerCache
+from rag.title_cache import SectionTitleCache
+from rag.embedding_cache import CachedEmbeddings
+from rag.summary_cache import SummaryCache
+from rag.indexer import BatchIndexer
+from rag.token_chunker import TokenChunker
 from weaviate.schema.properties import Property
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -25,12 +33,49 @@ async def startup_event():
 
     # Weaviate setup
     app.state.client = weaviate.Client(url="http://10.10.40.11:8080")
-    app.state.embedding = OllamaEmbeddings(model="nomic-embed-text", model_kwargs={"trust_remote_code": True}, base_url="http://192.168.1.19:11434")
+    # Embeddings mis en cache (LRU mémoire + SQLite sur disque) pour les requêtes comme pour les documents.
+    # Client langchain_ollama : aembed_query passe par le client HTTP asynchrone d'Ollama (pas de thread)
+    app.state.embedding = CachedEmbeddings(
+        OllamaEmbeddings(model="nomic-embed-text", base_url="http://192.168.1.19:11434"),
+        model_name="nomic-embed-text",
+        max_entries=10000,
+        disk_path="embeddings_cache.db",
+        disk_max_entries=200000
+    )
     app.state.llm = OllamaLLM(base_url="http://192.168.1.19:11434", model="llama3.2:3b")
+    # Nombre maximal d'appels LLM de résumé simultanés pendant l'ingestion (à aligner sur OLLAMA_NUM_PARALLEL)
+    app.state.summary_concurrency = 4
+    # Sémaphore unique partagé par tous les documents et tous les jobs : la borne est globale
+    app.state.summary_semaphore = asyncio.Semaphore(app.state.summary_concurrency)
+    # Résumés LLM déjà calculés (texte identique, même prompt, même modèle) réutilisés d'une ingestion à l'autre
+    app.state.summary_cache = SummaryCache("summaries_cache.db", max_entries=50000)
+    # Pool de process pour l'extraction PDF (pdfplumber est pur Python, lié au CPU) : une plage de pages par tâche.
+    # Process lancés par "spawn" : un fork hériterait des threads (rerank, to_thread), des clients et modèles déjà
+    # chargés. Taille bornée : quelques cœurs restent au reranking, aux tokenizers et à la boucle d'événements.
+    app.state.extraction_executor = ProcessPoolExecutor(
+        max_workers=max(1, min(4, (os.cpu_count() or 2) // 2)),
+        mp_context=multiprocessing.get_context("spawn")
+    )
     app.state.reranker_model = "cross-encoder/ms-marco-MiniLM-L-6-v2"
     # "cross-encoder/ms-marco-MiniLM-L-6-v2"
     # "linux6200/bge-reranker-v2-m3"
 
+    # Reranker chargé une seule fois au démarrage, partagé par toutes les requêtes (bascule via POST /reranker)
+    app.state.reranker_registry = reranker_registry
+    app.state.reranker_registry.get(app.state.reranker_model)
+    # Pool borné dédié au scoring cross-encoder : le CPU du reranking ne bloque jamais la boucle d'événements
+    app.state.rerank_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rerank")
+    # Chunks mesurés en tokens : budget du cross-encoder (512 moins la question et les tokens spéciaux)
+    # et fenêtre de nomic-embed-text sous Ollama (num_ctx 2048). Une bascule de reranker ne modifie pas ces budgets.
+    app.state.chunker = TokenChunker({
+        app.state.reranker_model: 440,
+        "nomic-ai/nomic-embed-text-v1.5": 2048
+    }, overlap=32)
+    # Cache de réponses par workspace, invalidé à chaque ingestion
+    app.state.answer_cache = SemanticAnswerCache(similarity_threshold=0.95, max_entries=1000, ttl_seconds=3600)
+    # Titres de sections par document (source, hash) pour le filtrage par section, invalidés à chaque ingestion
+    app.state.title_cache = SectionTitleCache(max_entries=1000)
+
 #     # 🔸 Connexion à Weaviate
 #     app.state.client = WeaviateClient(
 #         url="https://vector.internal.etixway.com",
@@ -77,7 +122,9 @@ async def startup_event():
         "section_title": "text",
         "idx_table": "int",
         "table_chunk_index": "int",
-        "page_num" : "int"
+        "page_num" : "int",
+        "section_idx": "int",
+        "section_hash": "text"
     }
     # print([method for method in dir(app.state.client.schema) if not method.startswith('_')])
    
@@ -122,12 +169,42 @@ async def startup_event():
         index_name="AO",
         text_key="text",
         by_text=False,
-        attributes=["source", "hash", "workspace_id", "confidentiality", "chunk_index", "type", "idx_table", "table_chunk_index", "page_num", "section_title"]
+        attributes=["source", "hash", "workspace_id", "confidentiality", "chunk_index", "type", "idx_table", "table_chunk_index", "page_num", "section_title", "section_idx", "section_hash"]
+    )
+
+    # Indexation par lots : embeddings par paquets de 64 chunks, import Weaviate à taille dynamique, objets rejetés renvoyés
+    app.state.indexer = BatchIndexer.from_vectorstore(
+        app.state.vectorstore,
+        embed_batch_size=64,
+        batch_size=100,
+        dynamic=True,
+        max_retries=3
     )
 
+    # Pipeline d'ingestion d'un lot : workers par étape et taille des files entre étapes (mémoire bornée)
+    app.state.pipeline_workers = {"extract": 2, "summarize": 2, "index": 1}
+    app.state.pipeline_queue_size = 2
+    # Nombre maximal de fichiers découpés en attente d'indexation pendant une ingestion
+    app.state.indexing_window = 2
+
+    # Ingestion en arrière-plan : /ingest et /ingests renvoient un job_id, suivi via GET /jobs/{job_id}
+    app.state.job_queue = jobs.IngestionJobQueue(
+        app,
+        workers=2,
+        stage_limits={"dedup": 4, "extract": 2, "summarize": 2, "index": 1}
+    )
+    await app.state.job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await app.state.job_queue.stop()
+    app.state.rerank_executor.shutdown(wait=False)
+    app.state.extraction_executor.shutdown(wait=False)
+
 # API routes
 app.include_router(ingest.router, prefix="")
 app.include_router(query.router, prefix="")
+app.include_router(jobs.router, prefix="")
 app.include_router(auth.router)
 app.include_router(user_manager.router)
 
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List
-from .auth import oauth2_scheme, get_user_from_token
-from rag.rag_pipeline import poser_question
+from .auth import oauth2_scheme, get_user_from_token, require_admin_role
+from rag.rag_pipeline import aposer_question, astream_question, MESSAGE_ERREUR
 from shared.enums import ConfidentialityLevel, UserRole
 from sqlalchemy.ext.asyncio import AsyncSession
 from models.db import get_db
+import json
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Requête unique
 class QuestionRequest(BaseModel):
     question: str
     workspace_id: str
 
+# Changement de reranker à chaud
+class RerankerRequest(BaseModel):
+    model_name: str
+    unload_previous: bool = False
+
 # Détermine les niveaux autorisés en fonction du rôle
 # def get_max_conf_level(role: UserRole) -> List[ConfidentialityLevel]:
 #     if role == UserRole.ADMIN:
@@ -28,11 +38,108 @@ async def query(request: Request, payload: QuestionRequest, token: str = Depends
     vectorstore = request.app.state.vectorstore
     reranker_model = request.app.state.reranker_model
     llm = request.app.state.llm
+    answer_cache = request.app.state.answer_cache
     user = await get_user_from_token(token, db)
-    allowed_levels = user.allowed_confidentiality
+    allowed_levels = user.get_confidentiality()
 
-    result = poser_question(payload.question, vectorstore, llm, payload.workspace_id, allowed_levels, reranker_model)
-    return {
+    # Cache sémantique : une question proche déjà posée sur le même workspace est servie directement
+    try:
+        query_vector = await vectorstore.embeddings.aembed_query(payload.question)
+        index_version = answer_cache.version(payload.workspace_id)
+        cached = answer_cache.get(payload.workspace_id, allowed_levels, query_vector)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'embedding de la question : {e}")
+        return {"response": MESSAGE_ERREUR, "sources": []}
+    if cached is not None:
+        return cached
+
+    result = await aposer_question(payload.question, vectorstore, llm, payload.workspace_id, allowed_levels, reranker_model, executor=request.app.state.rerank_executor, query_vector=query_vector, title_cache=request.app.state.title_cache)
+    response = {
         "response": result["response"],
         "sources": result["sources"]
-    }
\ No newline at end of file
+    }
+    # On ne met en cache que les vraies réponses (pas les erreurs ni les "aucun document")
+    if response["sources"]:
+        answer_cache.put(payload.workspace_id, allowed_levels, query_vector, response, index_version)
+    return response
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/query/stream")
+async def query_stream(request: Request, payload: QuestionRequest, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    vectorstore = request.app.state.vectorstore
+    reranker_model = request.app.state.reranker_model
+    llm = request.app.state.llm
+    user = await get_user_from_token(token, db)
+    allowed_levels = user.get_confidentiality()
+
+    answer_cache = request.app.state.answer_cache
+    try:
+        query_vector = await vectorstore.embeddings.aembed_query(payload.question)
+        index_version = answer_cache.version(payload.workspace_id)
+        cached = answer_cache.get(payload.workspace_id, allowed_levels, query_vector)
+        embedding_failed = False
+    except Exception as e:
+        logger.error(f"Erreur lors de l'embedding de la question : {e}")
+        embedding_failed = True
+
+    async def event_stream():
+        if embedding_failed:
+            yield format_sse("error", MESSAGE_ERREUR)
+            yield format_sse("done", "")
+            return
+        if cached is not None:
+            yield format_sse("sources", cached["sources"])
+            yield format_sse("token", cached["response"])
+            yield format_sse("done", "")
+            return
+
+        sources, tokens, failed = [], [], False
+        async for message in astream_question(payload.question, vectorstore, llm, payload.workspace_id, allowed_levels, reranker_model, executor=request.app.state.rerank_executor, query_vector=query_vector, title_cache=request.app.state.title_cache):
+            if message["event"] == "sources":
+                sources = message["data"]
+            elif message["event"] == "token":
+                tokens.append(message["data"])
+            elif message["event"] == "error":
+                failed = True
+            yield format_sse(message["event"], message["data"])
+
+        if sources and not failed:
+            answer_cache.put(payload.workspace_id, allowed_levels, query_vector, {"response": "".join(tokens), "sources": sources}, index_version)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/reranker")
+async def set_reranker(request: Request, payload: RerankerRequest, token: str = Depends(require_admin_role)):
+    registry = request.app.state.reranker_registry
+    previous_model = request.app.state.reranker_model
+
+    # Chargement hors de la boucle d'événements : les requêtes en cours continuent avec l'ancien modèle
+    try:
+        await run_in_threadpool(registry.get, payload.model_name)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Impossible de charger le reranker {payload.model_name} : {str(e)}")
+
+    request.app.state.reranker_model = payload.model_name
+    if payload.unload_previous and previous_model != payload.model_name:
+        registry.unload(previous_model)
+
+    return {
+        "message": f"✅ Reranker actif : {payload.model_name}",
+        "previous_model": previous_model,
+        "loaded_models": registry.loaded_models()
+    }
+
+@router.get("/cache/stats")
+async def cache_stats(request: Request, token: str = Depends(require_admin_role)):
+    return {
+        "embeddings": request.app.state.embedding.stats(),
+        "answers": request.app.state.answer_cache.stats(),
+        "summaries": request.app.state.summary_cache.stats(),
+        "section_titles": request.app.state.title_cache.stats()
+    }
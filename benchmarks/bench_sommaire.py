@@ -0,0 +1,68 @@
+"""
+Micro-benchmark de l'extraction du sommaire (clean_lines + extract_toc_lines) sur les AO fournis.
+
+Les pages sont lues une seule fois avec pdfplumber ; seul le traitement des lignes est chronométré,
+au total puis motif par motif, pour vérifier qu'un nouveau format ne ralentit pas l'extraction.
+
+Usage : python -m benchmarks.bench_sommaire [--repetitions 200] [--max-pages 7] [fichiers.pdf ...]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import pdfplumber
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.Handler.preprocessing import clean_lines, detect_lignes_recurrentes, extract_toc_lines
+from rag.Handler.motifs_sommaire import moteur_sommaire
+
+RACINE = Path(__file__).resolve().parent.parent
+PDF_PAR_DEFAUT = [RACINE / "CCTP 2.pdf", RACINE / "RC 1.pdf", RACINE / "RC 2.pdf"]
+
+def lire_pages(chemin: Path, max_pages: int) -> list[list[str]]:
+    with pdfplumber.open(chemin) as pdf:
+        return [
+            [l.strip() for l in (page.extract_text() or "").splitlines() if l.strip()]
+            for page in pdf.pages[:max_pages]
+        ]
+
+def chronometrer(fonction, repetitions: int) -> float:
+    """Durée moyenne d'un appel, en microsecondes."""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fichiers", nargs="*", type=Path, default=PDF_PAR_DEFAUT)
+    parser.add_argument("--repetitions", type=int, default=200)
+    parser.add_argument("--max-pages", type=int, default=7)
+    args = parser.parse_args()
+
+    for chemin in args.fichiers:
+        pages = lire_pages(chemin, args.max_pages)
+        raw_text = "".join("\n".join(lines) + "\n" for lines in pages)
+        lignes_recurrentes = detect_lignes_recurrentes(pages) if pages else set()
+        lines = clean_lines(raw_text, lignes_recurrentes)
+        titres = extract_toc_lines(lines)
+
+        t_clean = chronometrer(lambda: clean_lines(raw_text, lignes_recurrentes), args.repetitions)
+        t_toc = chronometrer(lambda: extract_toc_lines(lines), args.repetitions)
+
+        print(f"\n📄 {chemin.name} : {len(pages)} page(s), {len(lines)} ligne(s) nettoyée(s), {len(titres)} titre(s)")
+        print(f"  clean_lines       : {t_clean:9.1f} µs ({t_clean / max(len(lines), 1):.2f} µs/ligne)")
+        print(f"  extract_toc_lines : {t_toc:9.1f} µs ({t_toc / max(len(lines), 1):.2f} µs/ligne)")
+
+        # Coût de chaque motif seul sur toutes les lignes : repère un format trop coûteux
+        for motif in moteur_sommaire.motifs:
+            regex = re.compile(r'^(?:' + motif.motif + r')$', re.IGNORECASE)
+            t_motif = chronometrer(lambda: [regex.match(l) for l in lines], args.repetitions)
+            nb = sum(1 for l in lines if regex.match(l))
+            print(f"    {motif.nom:<18}: {t_motif:9.1f} µs, {nb} ligne(s) reconnue(s)")
+
+if __name__ == "__main__":
+    main()
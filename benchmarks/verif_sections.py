@@ -0,0 +1,98 @@
+"""
+Vérification du découpage en sections des AO fournis (blocs du PDFHandler, titres du sommaire balisés).
+
+Pour chaque PDF : nombre de titres balisés, sections quasi vides (contenu de moins de `--taille-min`
+caractères) et taille de la plus grande section. Une section quasi vide est en général une ligne de
+tableau ou de sommaire prise pour un titre : elle produit un chunk réduit au titre, en concurrence
+avec la vraie section à la recherche. Code de retour 1 si un fichier dépasse `--max-sections-vides`.
+
+Avant les PDF, le filtre des suites de titres est vérifié sur des blocs synthétiques : des titres
+empilés ("ARTICLE 3" → "3.1" → "3.1.1") restent des titres, des lignes de tableau redeviennent du texte.
+
+Usage : python -m benchmarks.verif_sections [--max-sections-vides 5] [--taille-min 50] [fichiers.pdf ...]
+"""
+import argparse
+import contextlib
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.Handler.PDFHandler import PDFHandler
+from rag.Handler.blocs import PARAGRAPHE, SAUT_DE_PAGE, TITRE, Bloc, FiltreSuitesDeTitres, sections_depuis_blocs
+
+RACINE = Path(__file__).resolve().parent.parent
+PDF_PAR_DEFAUT = [RACINE / "CCTP 2.pdf", RACINE / "RC 1.pdf", RACINE / "RC 2.pdf"]
+
+def filtrer(blocs: list[Bloc]) -> list[Bloc]:
+    filtre = FiltreSuitesDeTitres()
+    sortie = [b for bloc in blocs for b in filtre.ajouter(bloc)]
+    return sortie + filtre.terminer()
+
+def verifier_suites_de_titres() -> list[str]:
+    """Cas synthétiques du filtre des suites de titres ; renvoie les cas en échec."""
+    cas = {
+        # Titres empilés d'une vraie section, y compris à cheval sur un saut de page
+        "titres empilés conservés": ([
+            Bloc(TITRE, "ARTICLE 3 - PRESTATIONS", 4),
+            Bloc(TITRE, "3.1 Lot 1", 4),
+            Bloc(SAUT_DE_PAGE, page=4),
+            Bloc(TITRE, "3.1.1 Objet", 5),
+            Bloc(PARAGRAPHE, "Le titulaire réalise les études préalables.", 5),
+        ], 3),
+        # Lignes d'un tableau récapitulatif qui reprennent les intitulés du sommaire
+        "lignes de tableau rétrogradées": ([
+            Bloc(TITRE, "L1-UO1 Etude d'opportunité", 6),
+            Bloc(TITRE, "L1-UO2 Etude de faisabilité", 6),
+            Bloc(TITRE, "L1-UO3 Assistance au déploiement", 6),
+            Bloc(PARAGRAPHE, "Prix unitaires en euros HT.", 6),
+        ], 0),
+        # Entrées de même niveau : sommaire recopié dans le corps du document
+        "titres de même niveau rétrogradés": ([
+            Bloc(TITRE, "ARTICLE 1 - OBJET", 2),
+            Bloc(TITRE, "ARTICLE 2 - DUREE", 2),
+            Bloc(TITRE, "ARTICLE 3 - PRESTATIONS", 2),
+            Bloc(PARAGRAPHE, "Le présent marché a pour objet...", 2),
+        ], 0),
+    }
+    echecs = []
+    for nom, (blocs, titres_attendus) in cas.items():
+        titres = sum(bloc.type == TITRE for bloc in filtrer(blocs))
+        print(f"  {'✅' if titres == titres_attendus else '❌'} {nom} : {titres} titre(s), {titres_attendus} attendu(s)")
+        if titres != titres_attendus:
+            echecs.append(nom)
+    return echecs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fichiers", nargs="*", type=Path, default=PDF_PAR_DEFAUT)
+    parser.add_argument("--max-sections-vides", type=int, default=5)
+    parser.add_argument("--taille-min", type=int, default=50)
+    args = parser.parse_args()
+
+    print("🧪 Filtre des suites de titres")
+    echecs = verifier_suites_de_titres()
+    for chemin in args.fichiers:
+        # Journal de l'extraction (sommaire, entêtes retirés) masqué : seul le bilan est affiché
+        with contextlib.redirect_stdout(io.StringIO()):
+            blocs = list(PDFHandler(chemin.read_bytes()).iter_blocs())
+        sections = list(sections_depuis_blocs(blocs))
+        vides = [titre for titre, contenu in sections if len(contenu) < args.taille_min]
+
+        print(f"\n📄 {chemin.name} : {sum(bloc.type == TITRE for bloc in blocs)} titre(s), {len(sections)} section(s)")
+        print(f"  sections quasi vides : {len(vides)}")
+        for titre in vides:
+            print(f"    - {titre}")
+        print(f"  plus grande section  : {max((len(contenu) for _, contenu in sections), default=0)} caractères")
+
+        if len(vides) > args.max_sections_vides:
+            echecs.append(chemin.name)
+
+    if echecs:
+        print(f"\n❌ Échecs : {', '.join(echecs)}")
+        sys.exit(1)
+    print("\n✅ Découpage en sections conforme")
+
+if __name__ == "__main__":
+    main()
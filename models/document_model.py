@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from datetime import datetime
+from .db import Base
+
+class IndexedDocument(Base):
+    """
+    Registre local des documents indexés dans Weaviate (hash SHA-256 → document).
+    Sert à la détection de doublons sans aller-retour réseau.
+    """
+    __tablename__ = "indexed_documents"
+
+    hash = Column(String, primary_key=True, index=True)
+    # Peuvent être inconnus pour un hash rapatrié depuis Weaviate
+    source = Column(String, nullable=True)
+    workspace_id = Column(String, nullable=True, index=True)
+    confidentiality = Column(String, nullable=True)
+    chunk_count = Column(Integer, nullable=True)
+    indexed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, String, Float, DateTime, Text
+from datetime import datetime
+from .db import Base
+import json
+
+class IngestionJob(Base):
+    """
+    Job d'ingestion exécuté en arrière-plan. Persisté en base pour survivre à un redémarrage.
+    """
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued | running | done | failed
+    stage = Column(String, nullable=True)  # dedup | extract | summarize | split | index
+    progress = Column(Float, nullable=False, default=0.0)  # 0.0 → 1.0
+    workspace_id = Column(String, nullable=False)
+    confidentiality = Column(String, nullable=False)
+
+    # Liste de fichiers stockée en JSON : [{"filename", "path", "sha256"}]
+    files = Column(Text, nullable=False)
+    # Résultat final stocké en JSON
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def set_files(self, files: list[dict]):
+        self.files = json.dumps(files)
+
+    def get_files(self) -> list[dict]:
+        return json.loads(self.files)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "workspace_id": self.workspace_id,
+            "files": [f["filename"] for f in self.get_files()],
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,9 +1,34 @@
 from abc import ABC, abstractmethod
-from typing import List
-from langchain.schema import Document
+from itertools import islice
+from typing import AsyncIterator, Iterator
+import asyncio
+from .blocs import Bloc, asections_depuis_blocs
 
 class DocumentHandler(ABC):
 
     @abstractmethod
-    def load(self, filename: str, workspace_id: str, confidentiality, file_hash: str) -> List[Document]:
-        raise NotImplementedError
\ No newline at end of file
+    def iter_blocs(self, filename: str = None) -> Iterator[Bloc]:
+        """
+        Générateur des blocs typés du document (titre, paragraphe, tableau, saut de page), dans l'ordre de lecture.
+        """
+        pass
+
+    async def ablocs(self, filename: str = None, paquet: int = 64) -> AsyncIterator[Bloc]:
+        """
+        Blocs du document sans bloquer la boucle d'événements : par défaut, `iter_blocs`
+        avance dans un thread, `paquet` blocs à la fois.
+        """
+        blocs = self.iter_blocs(filename)
+        while True:
+            lot = await asyncio.to_thread(lambda: list(islice(blocs, paquet)))
+            if not lot:
+                return
+            for bloc in lot:
+                yield bloc
+
+    async def sections(self, filename: str = None) -> AsyncIterator[tuple[str, str]]:
+        """
+        Sections (titre, contenu) du document, produites au fil de l'extraction.
+        """
+        async for section in asections_depuis_blocs(self.ablocs(filename)):
+            yield section
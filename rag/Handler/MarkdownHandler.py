@@ -1,12 +1,12 @@
 import io
-from typing import List
-from langchain.schema import Document
+from typing import Iterator, List
 import markdown
 from markdown.treeprocessors import Treeprocessor
 from markdown.extensions import Extension
 import re
 
 from .DocumentHandler import DocumentHandler
+from .blocs import Bloc, TITRE, PARAGRAPHE, TABLEAU
 
 class MarkdownTableProcessor(Treeprocessor):
     def run(self, root):
@@ -25,8 +25,36 @@ class MarkdownTableProcessor(Treeprocessor):
         return tables
 
 class MarkdownHandler(DocumentHandler):
-    def __init__(self, content: bytes):
-        self.content = content
+    def __init__(self, content):
+        # Le markdown est traité en texte : un upload spoolé est relu en bytes
+        self.content = content if isinstance(content, (bytes, bytearray)) else content.getvalue()
+
+    def iter_blocs(self, filename: str = None) -> Iterator[Bloc]:
+        """
+        Blocs du markdown, ligne à ligne : titres (#, ##, ...), tableaux (lignes "|")
+        et paragraphes séparés par des lignes vides.
+        """
+        lignes = []
+        type_courant = None
+
+        def vider():
+            if lignes:
+                yield Bloc(type_courant, "\n".join(lignes))
+                lignes.clear()
+
+        for ligne in self.content.decode('utf-8').splitlines():
+            stripped = ligne.strip()
+            if re.match(r'^#{1,6}\s+\S', stripped):
+                yield from vider()
+                yield Bloc(TITRE, stripped.lstrip("#").strip())
+                continue
+            type_ligne = TABLEAU if stripped.startswith("|") else PARAGRAPHE if stripped else None
+            if type_ligne != type_courant:
+                yield from vider()
+                type_courant = type_ligne
+            if type_ligne is not None:
+                lignes.append(stripped if type_ligne == TABLEAU else ligne)
+        yield from vider()
 
     def extract_text_and_tables_by_order_clean(self) -> List[dict]:
         """
@@ -64,44 +92,3 @@ class MarkdownHandler(DocumentHandler):
                 })
 
         return elements
-
-    def load(self, filename: str, workspace_id: str, confidentiality, file_hash: str) -> List[Document]:
-        """
-        Charge le fichier Markdown et retourne une liste de documents (chunks).
-        """
-        # Récupérer les morceaux de texte extraits
-        content_chunks = self.extract_text_and_tables_by_order_clean()
-        documents = []
-
-        for idx, chunk in enumerate(content_chunks):
-            chunk_type = chunk["type"]
-            content = chunk["content"]
-            page_num = chunk["page_num"]
-
-            # Formater le contenu en fonction du type (texte ou tableau)
-            if chunk_type == "text":
-                page_content = content.strip()
-            elif chunk_type == "table":
-                page_content = (
-                    "| " + " | ".join(content[0]) + " |\n" +
-                    "| " + " | ".join(["---"] * len(content[0])) + " |\n" +
-                    "\n".join(["| " + " | ".join(row) + " |" for row in content[1:]])
-                )
-            else:
-                page_content = ""
-
-            # Ajouter le chunk comme un document LangChain
-            documents.append(Document(
-                page_content=page_content,
-                metadata={
-                    "source": filename,
-                    "hash": file_hash,
-                    "workspace_id": workspace_id,
-                    "confidentiality": confidentiality,
-                    "type": chunk_type,
-                    "page_num": page_num,
-                    "chunk_index": idx
-                }
-            ))
-
-        return documents
\ No newline at end of file
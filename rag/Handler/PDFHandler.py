@@ -1,43 +1,46 @@
 from .DocumentHandler import DocumentHandler
+import asyncio
 import os
+from contextlib import contextmanager
 from .preprocessing import *
 
 class PDFHandler(DocumentHandler):
-    def __init__(self, content: bytes):
-        self.content = content  # PDF binaire
-
-    async def load(self, filename: str, llm) -> str:
+    def __init__(self, content, executor=None, max_pages: int = 7):
+        self.content = content  # PDF binaire : bytes ou upload spoolé
+        self.executor = executor  # Pool de process pour l'extraction page par page (optionnel)
+        self.max_pages = max_pages  # Pages examinées pour détecter le sommaire
+
+    @contextmanager
+    def _fichier_extraction(self, filename: str):
+        # 💾 Texte brut extrait, écrit page par page dans 'extractions/'
+        if not filename:
+            yield None
+            return
+        os.makedirs("extractions", exist_ok=True)
+        with open(os.path.join("extractions", os.path.basename(filename) + ".txt"), "w", encoding="utf-8") as f:
+            yield f
+
+    def iter_blocs(self, filename: str = None) -> Iterator[Bloc]:
         """
-        Charge un PDF, extrait le texte et les tableaux, balise les titres, découpe par sections
-        et génère un résumé par section.
-
-        Retourne : un texte balisé contenant le résumé de chaque section.
+        Blocs du PDF (extraction séquentielle), titres présents dans le sommaire balisés.
         """
+        with self._fichier_extraction(filename) as fichier, ouvrir_pdf(self.content) as pdf:
+            baliseur = BaliseurPdf(self.max_pages, fichier)
+            for num, page in enumerate(pdf.pages):
+                yield from baliseur.ajouter(extraire_page(num, page))
+            yield from baliseur.terminer()
 
-        # Extraire texte brut + tables, contenu dans extractions
-        texte = extract_text_and_tables_markdown(self.content, filename=os.path.basename(filename) + ".txt")
-
-        # Extraire le sommaire du pdf
-        sommaire = extraire_titres_sommaire(filename)
-
-        # Baliser texte en utilisant les titres présents dans sommaire
-        texte_balise = balise_titres_sections(texte, sommaire)
-
-        # Séparer l’introduction (avant #) du reste
-        parties = re.split(r"(?=^# )", texte_balise, maxsplit=1, flags=re.MULTILINE)
-        intro_text = parties[0].strip()
-        reste_balise = parties[1] if len(parties) > 1 else ""
-
-        # Résumé de l’intro
-        resume = ""
-        if intro_text:
-            intro_summary = await summarize_section("Introduction", intro_text, llm=llm)
-            resume += f"# Introduction\n\n{intro_summary}\n\n{'=' * 80}\n\n"
-
-        # Regrouper et résumer le reste
-        sections = regrouper_par_sections(reste_balise)
-        for titre, contenu in sections.items():
-            resume_section = await summarize_section(titre, contenu, llm=llm)
-            resume += f"# {titre}\n\n{resume_section}\n\n{'=' * 80}\n\n"
-
-        return resume
+    async def ablocs(self, filename: str = None, paquet: int = 64) -> AsyncIterator[Bloc]:
+        """
+        Blocs du PDF au fil de l'extraction par plages de pages (sur le pool de process s'il est fourni) :
+        les premiers blocs sont disponibles dès que les pages du sommaire sont extraites.
+        Le balisage (sommaire, entêtes/pieds de page, titres) et l'écriture du fichier d'extraction
+        tournent dans un thread : la boucle d'événements reste libre pour les autres requêtes.
+        """
+        with self._fichier_extraction(filename) as fichier:
+            baliseur = BaliseurPdf(self.max_pages, fichier)
+            async for page in aiterer_pages_pdf(self.content, self.executor):
+                for bloc in await asyncio.to_thread(baliseur.ajouter, page):
+                    yield bloc
+            for bloc in await asyncio.to_thread(baliseur.terminer):
+                yield bloc
@@ -0,0 +1,144 @@
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+# Types de blocs produits par les handlers
+TITRE = "heading"
+PARAGRAPHE = "paragraph"
+TABLEAU = "table"
+SAUT_DE_PAGE = "page_break"
+
+@dataclass(frozen=True)
+class Bloc:
+    """
+    Unité de contenu d'un document, dans l'ordre de lecture : titre de section, paragraphe
+    (une ou plusieurs lignes de texte), tableau markdown ou saut de page.
+    """
+    type: str
+    texte: str = ""
+    page: Optional[int] = None
+
+def blocs_en_markdown(blocs: Iterable[Bloc]) -> str:
+    """
+    Texte markdown balisé (# Titre) d'un flux de blocs, assemblé en une seule jointure.
+    """
+    parties = []
+    for bloc in blocs:
+        if bloc.type == TITRE:
+            parties.append(f"# {bloc.texte}\n\n")
+        elif bloc.type in (PARAGRAPHE, TABLEAU) and bloc.texte:
+            parties.append(f"{bloc.texte}\n\n")
+    return "".join(parties).strip()
+
+class RegroupeurSections:
+    """
+    Regroupe un flux de blocs en sections (titre, contenu) au fil de l'eau :
+    le contenu avant le premier titre forme la section "Introduction" (si non vide).
+    Seule la section en cours est gardée en mémoire.
+    """
+
+    def __init__(self):
+        self.titre = None
+        self.contenu = []
+
+    def _section(self) -> Optional[tuple[str, str]]:
+        contenu = "\n\n".join(self.contenu).strip()
+        if self.titre is None:
+            return ("Introduction", contenu) if contenu else None
+        return self.titre, contenu
+
+    def ajouter(self, bloc: Bloc) -> Optional[tuple[str, str]]:
+        """Ajoute un bloc ; renvoie la section précédente quand un titre la termine."""
+        if bloc.type == TITRE:
+            terminee = self._section()
+            self.titre, self.contenu = bloc.texte, []
+            return terminee
+        if bloc.type in (PARAGRAPHE, TABLEAU) and bloc.texte:
+            self.contenu.append(bloc.texte)
+        return None
+
+    def terminer(self) -> Optional[tuple[str, str]]:
+        terminee = self._section()
+        self.titre, self.contenu = None, []
+        return terminee
+
+# Numérotation en tête de titre : "ARTICLE 3 - ...", "3.1 ...", "3.1.1. ...", "Chapitre 2 : ..."
+_RE_NUMEROTATION = re.compile(r'^(?:(?:article|chapitre|titre|partie|section|annexe)\s+)?(\d+(?:\.\d+)*)\b', re.IGNORECASE)
+
+def numerotation(titre: str) -> Optional[tuple[int, ...]]:
+    """Numéro hiérarchique d'un titre ((3, 1) pour "3.1 Lot 1"), None s'il n'est pas numéroté."""
+    match = _RE_NUMEROTATION.match(titre.strip())
+    return tuple(int(n) for n in match.group(1).split(".")) if match else None
+
+def suite_progressive(titres: list[str]) -> bool:
+    """
+    Vrais titres empilés : chaque titre est numéroté comme un sous-titre du précédent
+    ("ARTICLE 3" → "3.1" → "3.1.1"). Des titres de même niveau, non numérotés ou qui remontent
+    dans la hiérarchie se suivent dans un sommaire ou un tableau, pas en tête de section.
+    """
+    numeros = [numerotation(titre) for titre in titres]
+    return all(
+        parent is not None and enfant is not None and len(enfant) > len(parent) and enfant[:len(parent)] == parent
+        for parent, enfant in zip(numeros, numeros[1:])
+    )
+
+class FiltreSuitesDeTitres:
+    """
+    Annule le balisage des suites de plus de `max_suite` titres sans contenu entre eux (les sauts de
+    page ne comptent pas comme contenu) qui ressemblent à un sommaire ou à un tableau récapitulatif :
+    titres de même niveau ou non numérotés, qui reprennent les intitulés des sections. Ces titres
+    redeviennent du texte, au lieu de produire autant de sections vides. Les titres empilés dont la
+    numérotation descend dans la hiérarchie (voir suite_progressive) sont conservés.
+    Seule la suite de titres en cours est gardée en mémoire.
+    """
+
+    def __init__(self, max_suite: int = 2):
+        self.max_suite = max_suite
+        self._en_attente = []
+
+    def ajouter(self, bloc: Bloc) -> list[Bloc]:
+        if bloc.type == TITRE or (bloc.type == SAUT_DE_PAGE and self._en_attente):
+            self._en_attente.append(bloc)
+            return []
+        blocs = self.terminer()
+        blocs.append(bloc)
+        return blocs
+
+    def terminer(self) -> list[Bloc]:
+        en_attente, self._en_attente = self._en_attente, []
+        titres = [bloc.texte for bloc in en_attente if bloc.type == TITRE]
+        if len(titres) <= self.max_suite or suite_progressive(titres):
+            return en_attente
+
+        # Titres d'une même page regroupés en un paragraphe, sauts de page conservés
+        blocs, titres = [], []
+        for bloc in en_attente + [None]:
+            if bloc is not None and bloc.type == TITRE:
+                titres.append(bloc)
+                continue
+            if titres:
+                blocs.append(Bloc(PARAGRAPHE, "\n".join(titre.texte for titre in titres), titres[0].page))
+                titres = []
+            if bloc is not None:
+                blocs.append(bloc)
+        return blocs
+
+def sections_depuis_blocs(blocs: Iterable[Bloc]) -> Iterator[tuple[str, str]]:
+    regroupeur = RegroupeurSections()
+    for bloc in blocs:
+        section = regroupeur.ajouter(bloc)
+        if section is not None:
+            yield section
+    section = regroupeur.terminer()
+    if section is not None:
+        yield section
+
+async def asections_depuis_blocs(blocs: AsyncIterator[Bloc]) -> AsyncIterator[tuple[str, str]]:
+    regroupeur = RegroupeurSections()
+    async for bloc in blocs:
+        section = regroupeur.ajouter(bloc)
+        if section is not None:
+            yield section
+    section = regroupeur.terminer()
+    if section is not None:
+        yield section
@@ -0,0 +1,110 @@
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Iterator, Optional
+
+# Frontières lettre/chiffre : "1.1Titre" et "1.1 Titre" donnent les mêmes mots
+_RE_NON_MOT = re.compile(r'[\W_]+')
+_RE_LETTRE_CHIFFRE = re.compile(r'(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])')
+
+def normaliser_titre(texte: str) -> str:
+    """
+    Forme normalisée d'un titre : minuscules, sans accents, ponctuation (y compris celle de la
+    numérotation : "1.2.", "II-1", "Art. 3 :") remplacée par des espaces.
+    """
+    texte = unicodedata.normalize("NFKD", texte.lower())
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    texte = _RE_LETTRE_CHIFFRE.sub(" ", texte)
+    return _RE_NON_MOT.sub(" ", texte).strip()
+
+def _numeros(titre_normalise: str) -> list[str]:
+    return [mot for mot in titre_normalise.split() if mot.isdigit()]
+
+class IndexTitres:
+    """
+    Index des titres du sommaire pour reconnaître les titres de section dans le texte :
+    - table des titres normalisés (égalité exacte) ;
+    - table des préfixes par mots, pour un titre coupé sur plusieurs lignes ;
+    - titres groupés par premier mot, comparés avec tolérance (`seuil` de similarité,
+      mêmes numéros) pour absorber les petites différences d'extraction.
+
+    Chaque ligne coûte quelques accès aux tables et au plus `max_lignes` lignes de lecture
+    anticipée : le balisage reste linéaire en taille du document.
+    """
+
+    def __init__(self, titres: list[str], seuil: float = 0.92, max_lignes: int = 3, longueur_min: int = 3):
+        self.seuil = seuil
+        self.max_lignes = max_lignes
+        self.longueur_min = longueur_min
+        self._titres = set()
+        self._prefixes = set()
+        self._par_premier_mot = defaultdict(list)
+
+        for titre in titres:
+            normalise = normaliser_titre(titre)
+            if len(normalise) < longueur_min or normalise in self._titres:
+                continue
+            self._titres.add(normalise)
+            mots = normalise.split()
+            self._prefixes.update(" ".join(mots[:k]) for k in range(1, len(mots)))
+            self._par_premier_mot[mots[0]].append(normalise)
+
+    def __bool__(self) -> bool:
+        return bool(self._titres)
+
+    def correspond(self, normalise: str) -> bool:
+        if len(normalise) < self.longueur_min:
+            return False
+        if normalise in self._titres:
+            return True
+        candidats = self._par_premier_mot.get(normalise.split()[0], ())
+        numeros = _numeros(normalise)
+        for candidat in candidats:
+            # Filtre bon marché avant la similarité : longueurs proches, numérotation identique
+            if abs(len(candidat) - len(normalise)) > (1 - self.seuil) * max(len(candidat), len(normalise)) + 1:
+                continue
+            if _numeros(candidat) != numeros:
+                continue
+            if SequenceMatcher(None, candidat, normalise).ratio() >= self.seuil:
+                return True
+        return False
+
+    def est_debut(self, normalise: str) -> bool:
+        """La ligne peut être le début d'un titre coupé sur plusieurs lignes."""
+        return normalise in self._prefixes
+
+    def baliser_lignes(self, lignes: list[str]) -> Iterator[tuple[bool, str]]:
+        """
+        Parcourt les lignes et renvoie (est_titre, texte) : un titre (éventuellement reconstitué
+        sur plusieurs lignes) est renvoyé nettoyé, les autres lignes telles quelles.
+        """
+        i = 0
+        while i < len(lignes):
+            ligne = lignes[i]
+            ligne_stripped = re.sub(r'[\r\n\t\f\v]', '', ligne.strip().replace('\u00a0', ' '))
+            normalise = normaliser_titre(ligne_stripped)
+
+            titre = self._titre_a_partir_de(lignes, i, ligne_stripped, normalise) if normalise else None
+            if titre is None:
+                yield False, ligne
+                i += 1
+            else:
+                texte, nb_lignes = titre
+                yield True, texte
+                i += nb_lignes
+
+    def _titre_a_partir_de(self, lignes: list[str], i: int, ligne_stripped: str, normalise: str) -> Optional[tuple[str, int]]:
+        if self.correspond(normalise):
+            return ligne_stripped, 1
+
+        texte = ligne_stripped
+        for j in range(1, self.max_lignes):
+            if not self.est_debut(normalise) or i + j >= len(lignes):
+                return None
+            suite = lignes[i + j].strip().replace('\u00a0', ' ')
+            texte = f"{texte} {suite}"
+            normalise = normaliser_titre(texte)
+            if self.correspond(normalise):
+                return texte, j + 1
+        return None
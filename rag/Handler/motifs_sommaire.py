@@ -0,0 +1,114 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+# Modes de lecture d'un titre de sommaire
+ENTREE = "entree"                  # titre et numéro de page sur la même ligne
+LIGNE_SUIVANTE = "ligne_suivante"  # la ligne annonce le titre, qui est sur la ligne suivante
+MULTILIGNE = "multiligne"          # titre continué jusqu'à la ligne portant le numéro de page
+
+# Ligne portant le numéro de page d'une entrée multi-ligne : "12" ou "...... 12"
+_RE_FIN_MULTILIGNE = re.compile(r'(?:\.{3,}\s*)?\d{1,3}$')
+
+@dataclass(frozen=True)
+class MotifSommaire:
+    """
+    Format d'entrée de sommaire.
+    `motif` : expression ancrée sur toute la ligne (insensible à la casse) ; en mode ENTREE,
+    le titre est le groupe nommé `titre`, sinon c'est la ligne entière.
+    """
+    nom: str
+    motif: str
+    mode: str = ENTREE
+
+MOTIFS_PAR_DEFAUT = [
+    # "Article 1 DEFINITIONS ......... 3"
+    MotifSommaire("article", r'(?P<titre>ARTICLE\s+\d+\s+.+?)\.{3,}\s*\d{1,3}'),
+    # "Article 1" seul → titre sur deux lignes
+    MotifSommaire("article_seul", r'\s*ARTICLE\s+\d+\s*', LIGNE_SUIVANTE),
+    # "1.1.2 Titre .... 4"
+    MotifSommaire("numerote", r'(?P<titre>\d+(?:\.\d+)+\s+.+?)\.{3,}\s*\d{1,3}'),
+    # "II.1 Quelque chose 5"
+    MotifSommaire("romain", r'(?P<titre>[IVXLCDM]+\.\d+.*?\s+.+?)\d{1,3}'),
+    # "AB1-UO2 : Titre ....... 4"
+    MotifSommaire("unite_oeuvre", r'(?P<titre>[A-Z]+\d+-UO\d+\s*:\s+.+?)\.{3,}\s*\d{1,3}'),
+    # Début d'un titre coupé sur plusieurs lignes (autres formats)
+    MotifSommaire("debut_multiligne", r'ARTICLE\s+\d+.*|\d+(?:\.\d+)+\s+.*|[IVXLCDM]+\.\d+.*|[A-Z]+\d+-UO\d+\s*:\s+.*', MULTILIGNE),
+]
+
+class MoteurSommaire:
+    """
+    Extraction des titres d'un sommaire à partir d'une table de motifs.
+
+    Les motifs sont compilés en une seule expression (alternative ordonnée : le premier motif
+    qui reconnaît la ligne l'emporte, comme une suite de tests), évaluée une fois par ligne.
+    Les titres sur plusieurs lignes sont complétés en regardant au plus `max_lignes_suivantes`
+    lignes plus loin : le parcours reste linéaire en nombre de lignes.
+    """
+
+    def __init__(self, motifs: list[MotifSommaire] = None, max_lignes_suivantes: int = 5):
+        self.motifs = list(motifs if motifs is not None else MOTIFS_PAR_DEFAUT)
+        self.max_lignes_suivantes = max_lignes_suivantes
+        self._compiler()
+
+    def _compiler(self):
+        branches = []
+        for i, motif in enumerate(self.motifs):
+            # Groupes nommés uniques par branche : m<i> pour la branche, t<i> pour le titre
+            corps = motif.motif.replace("(?P<titre>", f"(?P<t{i}>")
+            branches.append(f"(?P<m{i}>{corps})")
+        self._regex = re.compile(r'^(?:' + "|".join(branches) + r')$', re.IGNORECASE)
+
+    def enregistrer(self, motif: MotifSommaire, position: Optional[int] = None):
+        """
+        Ajoute un format de sommaire. Par défaut, il est testé avant le fallback multi-ligne.
+        """
+        if position is None:
+            position = next((i for i, m in enumerate(self.motifs) if m.mode == MULTILIGNE), len(self.motifs))
+        self.motifs.insert(position, motif)
+        self._compiler()
+
+    def reconnaitre(self, ligne: str) -> Optional[tuple[MotifSommaire, str]]:
+        """Motif reconnu sur la ligne et titre correspondant, ou None."""
+        match = self._regex.match(ligne)
+        if match is None:
+            return None
+        i = int(match.lastgroup[1:])
+        motif = self.motifs[i]
+        if motif.mode == ENTREE:
+            return motif, match.group(f"t{i}").strip()
+        return motif, ligne
+
+    def extraire(self, lines: list[str]) -> list[str]:
+        toc = []
+        lines = [line.strip() for line in lines]
+
+        for idx, line in enumerate(lines):
+            if not line:
+                continue
+            reconnu = self.reconnaitre(line)
+            if reconnu is None:
+                continue
+            motif, titre = reconnu
+            suivantes = lines[idx + 1: idx + 1 + self.max_lignes_suivantes]
+
+            if motif.mode == ENTREE:
+                toc.append(titre)
+
+            elif motif.mode == LIGNE_SUIVANTE:
+                next_line = next((l for l in suivantes if l), None)
+                if next_line is not None:
+                    toc.append(f"{titre} {next_line}")
+
+            else:
+                morceaux = [titre]
+                for next_line in suivantes:
+                    if _RE_FIN_MULTILIGNE.match(next_line):
+                        toc.append(" ".join(morceaux).strip())
+                        break
+                    morceaux.append(next_line)
+
+        return toc
+
+# Moteur utilisé par l'extraction ; `moteur_sommaire.enregistrer(...)` pour un nouveau format d'AO
+moteur_sommaire = MoteurSommaire()
@@ -1,11 +1,19 @@
+import asyncio
 import io
 import pdfplumber
 import re
 import os
 from pathlib import Path
-import fitz  # PyMuPDF
 import math
-from collections import Counter 
+from collections import Counter, deque
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from itertools import islice
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator
+from dataclasses import dataclass, field
+from .motifs_sommaire import moteur_sommaire
+from .index_titres import IndexTitres
+from .blocs import Bloc, FiltreSuitesDeTitres, TITRE, PARAGRAPHE, TABLEAU, SAUT_DE_PAGE
 
 def tableau_en_markdown(table):
     if not table or not any(table):
@@ -27,24 +35,223 @@ def tableau_en_markdown(table):
 
     return "\n".join(lignes_md)
 
-def extract_text_and_tables_markdown(pdf_bytes: bytes, filename: str = "extraction.txt") -> str:
-    texte_final = ""
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages:
-            texte_page = page.extract_text()
-            if texte_page:
-                texte_final += texte_page.strip() + "\n\n"
-            for table in page.extract_tables():
-                markdown_table = tableau_en_markdown(table)
-                if markdown_table:
-                    texte_final += markdown_table + "\n\n"
-
-    # 💾 Sauvegarde dans le dossier 'extractions/'
-    os.makedirs("extractions", exist_ok=True)
-    with open(os.path.join("extractions", filename), "w", encoding="utf-8") as f:
-        f.write(texte_final)
-
-    return texte_final
+@dataclass
+class PagePdf:
+    """
+    Contenu extrait d'une page : texte brut (pdfplumber) et tableaux déjà convertis en markdown.
+    """
+    num: int
+    texte: str
+    tables: list[str] = field(default_factory=list)
+
+    @property
+    def lignes(self) -> list[str]:
+        return [l.strip() for l in self.texte.splitlines() if l.strip()]
+
+def extraire_page(num: int, page) -> PagePdf:
+    texte_page = page.extract_text() or ""
+    tables = [md for md in (tableau_en_markdown(table) for table in page.extract_tables()) if md]
+    return PagePdf(num=num, texte=texte_page.strip(), tables=tables)
+
+def ouvrir_flux(contenu) -> BinaryIO:
+    """
+    Flux binaire sur un contenu reçu : bytes (BytesIO partageant le buffer, sans copie)
+    ou upload spoolé (voir rag.upload.SpooledUpload).
+    """
+    if isinstance(contenu, (bytes, bytearray)):
+        return io.BytesIO(contenu)
+    return contenu.stream()
+
+def source_pour_worker(contenu):
+    """
+    Source transmissible à un process d'extraction : chemin du fichier si l'upload a été
+    spoolé sur disque (chaque worker le rouvre), sinon le contenu en bytes.
+    """
+    if isinstance(contenu, (bytes, bytearray)):
+        return contenu
+    return contenu.path or contenu.getvalue()
+
+@contextmanager
+def ouvrir_pdf(source):
+    if isinstance(source, str):
+        with pdfplumber.open(source) as pdf:
+            yield pdf
+    else:
+        with ouvrir_flux(source) as flux, pdfplumber.open(flux) as pdf:
+            yield pdf
+
+def compter_pages_pdf(source) -> int:
+    with ouvrir_pdf(source) as pdf:
+        return len(pdf.pages)
+
+def extraire_plage_pages(source, debut: int, fin: int) -> list[PagePdf]:
+    """
+    Extrait les pages [debut, fin[ : fonction exécutée dans un process du pool d'extraction,
+    chaque worker ouvrant sa propre instance du PDF (depuis un chemin ou des bytes).
+    """
+    with ouvrir_pdf(source) as pdf:
+        return [extraire_page(num, pdf.pages[num]) for num in range(debut, min(fin, len(pdf.pages)))]
+
+def assembler_texte_markdown(pages: list[PagePdf]) -> str:
+    parties = []
+    for page in pages:
+        if page.texte:
+            parties.append(page.texte + "\n\n")
+        parties.extend(table + "\n\n" for table in page.tables)
+    return "".join(parties)
+
+def blocs_de_page(page: PagePdf) -> Iterator[Bloc]:
+    """
+    Blocs d'une page PDF : son texte (un paragraphe multi-ligne), ses tableaux, puis un saut de page.
+    """
+    if page.texte:
+        yield Bloc(PARAGRAPHE, page.texte, page.num)
+    for table in page.tables:
+        yield Bloc(TABLEAU, table, page.num)
+    yield Bloc(SAUT_DE_PAGE, page=page.num)
+
+async def aiterer_pages_pdf(contenu, executor: Executor = None, pages_par_lot: int = 8, lots_en_vol: int = None) -> AsyncIterator[PagePdf]:
+    """
+    Pages du PDF dans l'ordre, au fur et à mesure de leur extraction par plages de `pages_par_lot`
+    sur `executor` (pool par défaut de la boucle si None). Au plus `lots_en_vol` plages sont en cours
+    ou en attente de consommation : la mémoire ne dépend pas du nombre de pages.
+    """
+    loop = asyncio.get_running_loop()
+    source = source_pour_worker(contenu)
+    nb_pages = await loop.run_in_executor(executor, compter_pages_pdf, source)
+    lots_en_vol = lots_en_vol or os.cpu_count() or 1
+
+    debuts = iter(range(0, nb_pages, pages_par_lot))
+    en_vol = deque()
+    for debut in islice(debuts, lots_en_vol):
+        en_vol.append(loop.run_in_executor(executor, extraire_plage_pages, source, debut, debut + pages_par_lot))
+    try:
+        while en_vol:
+            lot = await en_vol.popleft()
+            debut = next(debuts, None)
+            if debut is not None:
+                en_vol.append(loop.run_in_executor(executor, extraire_plage_pages, source, debut, debut + pages_par_lot))
+            for page in lot:
+                yield page
+    finally:
+        for future in en_vol:
+            future.cancel()
+
+# Numéros neutralisés dans les lignes courtes : "Page 3 sur 12" et "Page 4 sur 12" sont le même pied de page
+_RE_CHIFFRES = re.compile(r'\d+')
+_LONGUEUR_MAX_NUMEROTEE = 40
+
+class DetecteurEntetesPieds:
+    """
+    Détection des entêtes et pieds de page sur l'ensemble du document, en une passe.
+
+    Seules les `zone` premières et dernières lignes de chaque page sont candidates. Chacune est
+    réduite à une clé (position dans la page, hash de la ligne normalisée, chiffres neutralisés
+    pour les lignes courtes), comptée une fois par page. Une clé présente sur au moins `seuil` des pages vues (et sur
+    `min_pages` pages au minimum) est un entête/pied : les lignes correspondantes sont retirées.
+    Les statistiques s'affinent à chaque page ; seules les clés et leurs compteurs sont gardés.
+    """
+
+    def __init__(self, zone: int = 3, seuil: float = 0.6, min_pages: int = 3):
+        self.zone = zone
+        self.seuil = seuil
+        self.min_pages = min_pages
+        self.pages_vues = 0
+        self.lignes_retirees = 0
+        self._compteurs = Counter()
+
+    def _cles(self, lignes: list[str]) -> list[tuple[int, int, int]]:
+        """(index de la ligne, position signée, hash) des lignes candidates."""
+        n = len(lignes)
+        indices = sorted(set(range(min(self.zone, n))) | set(range(max(n - self.zone, 0), n)))
+        cles = []
+        for i in indices:
+            # Position depuis le haut pour l'entête, depuis le bas (négative) pour le pied de page
+            position = i if i < self.zone else i - n
+            ligne = lignes[i].lower()
+            if len(ligne) <= _LONGUEUR_MAX_NUMEROTEE:
+                ligne = _RE_CHIFFRES.sub("#", ligne)
+            cles.append((i, position, hash(ligne)))
+        return cles
+
+    def observer(self, lignes: list[str]):
+        self.pages_vues += 1
+        self._compteurs.update({(position, h) for _, position, h in self._cles(lignes)})
+
+    def nettoyer(self, lignes: list[str]) -> list[str]:
+        minimum = max(self.min_pages, self.seuil * self.pages_vues)
+        a_retirer = {i for i, position, h in self._cles(lignes) if self._compteurs[(position, h)] >= minimum}
+        self.lignes_retirees += len(a_retirer)
+        return [ligne for i, ligne in enumerate(lignes) if i not in a_retirer]
+
+    def nettoyer_page(self, page: PagePdf) -> PagePdf:
+        if not page.texte:
+            return page
+        return PagePdf(num=page.num, texte="\n".join(self.nettoyer(page.lignes)), tables=page.tables)
+
+class BaliseurPdf:
+    """
+    Transforme les pages PDF, reçues dans l'ordre, en blocs dont les titres du sommaire sont balisés.
+    Les `max_pages` premières pages sont retenues le temps de détecter le sommaire, puis chaque page
+    est convertie dès sa réception. `fichier` (optionnel) reçoit le texte brut extrait, page par page.
+
+    Chaque page alimente le détecteur d'entêtes/pieds de page, qui les retire du texte avant balisage :
+    ils ne sont ni répétés dans chaque section, ni résumés, ni embeddés.
+
+    Les pages du sommaire lui-même (au moins `min_entrees_sommaire` entrées reconnues) ne sont pas
+    balisées, et les suites de titres sans contenu (tableaux récapitulatifs) redeviennent du texte.
+    """
+
+    def __init__(self, max_pages: int = 7, fichier=None, detecteur: DetecteurEntetesPieds = None, min_entrees_sommaire: int = 2):
+        self.max_pages = max_pages
+        self.fichier = fichier
+        self.detecteur = detecteur or DetecteurEntetesPieds()
+        self.min_entrees_sommaire = min_entrees_sommaire
+        self.sommaire = None
+        self.index = None
+        self.pages_sommaire = set()
+        self._filtre = FiltreSuitesDeTitres()
+        self._pages_debut = []
+
+    def _blocs(self, pages: list[PagePdf]) -> list[Bloc]:
+        blocs = []
+        for page in pages:
+            if self.fichier is not None:
+                self.fichier.write(assembler_texte_markdown([page]))
+            page = self.detecteur.nettoyer_page(page)
+            blocs_page = blocs_de_page(page)
+            if page.num not in self.pages_sommaire:
+                blocs_page = baliser_blocs(blocs_page, self.index)
+            for bloc in blocs_page:
+                blocs.extend(self._filtre.ajouter(bloc))
+        return blocs
+
+    def ajouter(self, page: PagePdf) -> list[Bloc]:
+        self.detecteur.observer(page.lignes)
+        if self.sommaire is not None:
+            return self._blocs([page])
+        self._pages_debut.append(page)
+        if len(self._pages_debut) < self.max_pages:
+            return []
+        return self._premieres_pages()
+
+    def _premieres_pages(self) -> list[Bloc]:
+        self.sommaire, _ = extraire_sommaire_depuis_pages([page.lignes for page in self._pages_debut])
+        # Index des titres construit une fois pour tout le document
+        self.index = IndexTitres(self.sommaire)
+        self.pages_sommaire = {
+            page.num for page in self._pages_debut
+            if len(extract_toc_lines(clean_lines(page.texte))) >= self.min_entrees_sommaire
+        }
+        pages, self._pages_debut = self._pages_debut, []
+        return self._blocs(pages)
+
+    def terminer(self) -> list[Bloc]:
+        blocs = self._premieres_pages() if self.sommaire is None else []
+        blocs.extend(self._filtre.terminer())
+        if self.detecteur.lignes_retirees:
+            print(f"🧹 {self.detecteur.lignes_retirees} ligne(s) d'entête/pied de page retirée(s) sur {self.detecteur.pages_vues} page(s)")
+        return blocs
 
 def detect_lignes_recurrentes(pages: list[list[str]], seuil: float = 0.6) -> set[str]:
     """
@@ -61,134 +268,53 @@ def detect_lignes_recurrentes(pages: list[list[str]], seuil: float = 0.6) -> set
     return {ligne for ligne, count in ligne_counts.items() if count / nb_pages >= seuil}
 
 
+# Nettoyage des lignes : expressions compilées une fois ; la recherche des caractères de contrôle
+# n'est faite que sur les lignes non imprimables (str.isprintable, en C)
+_RE_CARACTERES_CONTROLE = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+_RE_PAGE_SUR = re.compile(r'^Page\s+\d+\s+sur\s+\d+', re.IGNORECASE)
+_RE_NUMERO_SEUL = re.compile(r'^\d+$')
+_RE_POINTILLES = re.compile(r'\.{3,}')
+
 def clean_lines(raw_text: str, lignes_a_ignorer: set[str] = None) -> list[str]:
-    lines = raw_text.splitlines()
-    lines = [re.sub(r'[\u00a0]', ' ', l).strip() for l in lines if l.strip()]
     cleaned = []
-    buffer = ""
+    buffer = []
     lignes_a_ignorer = lignes_a_ignorer or set()
 
-    for line in lines:
-        line = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', line).strip()
+    for line in raw_text.splitlines():
+        line = line.replace('\u00a0', ' ').strip()
+        if not line.isprintable():
+            line = _RE_CARACTERES_CONTROLE.sub('', line).strip()
         if not line or line in lignes_a_ignorer:
             continue
 
-        if re.match(r'^Page\s+\d+\s+sur\s+\d+', line, re.IGNORECASE):
+        if _RE_PAGE_SUR.match(line):
             continue
 
-        if re.match(r'^\d+$', line):
-            if buffer:
-                buffer += ' ' + line
-                cleaned.append(buffer)
-                buffer = ""
-            else:
-                cleaned.append(line)
-        elif re.search(r'\.{3,}', line):
-            if buffer:
-                buffer += ' ' + line
-                cleaned.append(buffer)
-                buffer = ""
-            else:
-                cleaned.append(line)
+        if _RE_NUMERO_SEUL.match(line) or _RE_POINTILLES.search(line):
+            # Numéro de page ou points de suite : termine l'entrée en cours
+            buffer.append(line)
+            cleaned.append(" ".join(buffer))
+            buffer = []
         else:
-            if buffer:
-                buffer += ' ' + line
-            else:
-                buffer = line
+            buffer.append(line)
 
     if buffer:
-        cleaned.append(buffer)
+        cleaned.append(" ".join(buffer))
     return cleaned
 
-def extraire_titres_sommaire(pdf_path: str, max_pages: int = 7) -> list[str]:
-    def load_pdf_text(path, max_pages):
-        text = ""
-        pages = []
-        doc = fitz.open(path)
-        for i in range(min(len(doc), max_pages)):
-            page = doc.load_page(i)
-            page_text = page.get_text()
-            lines = [l.strip() for l in page_text.splitlines() if l.strip()]
-            pages.append(lines)
-            text += "\n".join(lines) + "\n"
-            joined_lines = '\n'.join(lines[:5])
-            print(f"\n=== Page {i+1} ===\n{repr(joined_lines)}")
-
-        return text, pages
-
-    def extract_toc_lines(lines):
-        toc = []
-
-        for idx, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-
-            # Cas : "Article 1 DEFINITIONS ......... 3"
-            match = re.match(r'^(ARTICLE\s+\d+\s+.+?)\.{3,}\s*\d{1,3}$', line, re.IGNORECASE)
-            if match:
-                toc.append(match.group(1).strip())
-                continue
-
-            # Cas : "Article 1" seul → titre sur deux lignes
-            match = re.match(r'^\s*ARTICLE\s+\d+\s*$', line, re.IGNORECASE)
-            if match:
-                i = idx + 1
-                while i < len(lines):
-                    next_line = lines[i].strip()
-                    if next_line:
-                        full_title = f"{line.strip()} {next_line.strip()}"
-                        toc.append(full_title)
-                        break
-                    i += 1
-                continue
-
-            # Cas : "1.1.2 Titre" .... 4
-            match = re.match(r'^((\d+(\.\d+)+)\s+.+?)\.{3,}\s*(\d{1,3})$', line)
-            if match:
-                toc.append(match.group(1).strip())
-                continue
-
-            # Cas : "II.1 Quelque chose" page 5
-            match = re.match(r'^(([IVXLCDM]+\.\d+.*?)\s+.+?)(\d{1,3})$', line, re.IGNORECASE)
-            if match:
-                toc.append(match.group(1).strip())
-                continue
-
-            # Cas : "AB1-UO2 : Titre ....... 4"
-            match = re.match(r'^([A-Z]+\d+-UO\d+\s*:\s+.+?)\.{3,}\s*(\d{1,3})$', line, re.IGNORECASE)
-            if match:
-                toc.append(match.group(1).strip())
-                continue
-
-            # Fallback : tentative de détection multi-ligne pour autres formats
-            multiline_start = re.match(
-                r'^(ARTICLE\s+\d+.*|(\d+(\.\d+)+)\s+.*|[IVXLCDM]+\.\d+.*|[A-Z]+\d+-UO\d+\s*:\s+.*)$',
-                line, re.IGNORECASE
-            )
-            if multiline_start:
-                temp_title = line
-                i = idx + 1
-                while i < len(lines):
-                    next_line = lines[i].strip()
-                    if re.match(r'^\s*\d{1,3}$', next_line):
-                        toc.append(temp_title.strip())
-                        break
-                    page_match = re.match(r'(?:\.{3,}\s*)?(\d{1,3})$', next_line)
-                    if page_match:
-                        toc.append(temp_title.strip())
-                        break
-                    temp_title += ' ' + next_line
-                    i += 1
-                continue
-
-        return toc
-
-    if not Path(pdf_path).exists():
-        raise FileNotFoundError(f"❌ Fichier introuvable : {pdf_path}")
+def extract_toc_lines(lines):
+    """
+    Titres du sommaire reconnus dans les lignes nettoyées (voir motifs_sommaire pour les formats pris en charge).
+    """
+    return moteur_sommaire.extraire(lines)
 
-    raw_text, pages_lines = load_pdf_text(pdf_path, max_pages=max_pages)
-    lignes_recurrentes = detect_lignes_recurrentes(pages_lines)
+def extraire_sommaire_depuis_pages(pages_lines: list[list[str]]) -> tuple[list[str], set[str]]:
+    """
+    Détecte les lignes récurrentes puis extrait les titres du sommaire à partir des lignes
+    des premières pages. Retourne (titres, lignes récurrentes).
+    """
+    raw_text = "".join("\n".join(lines) + "\n" for lines in pages_lines)
+    lignes_recurrentes = detect_lignes_recurrentes(pages_lines) if pages_lines else set()
 
     print("\n📌 Lignes ignorées (entêtes récurrents détectés) :")
     for l in lignes_recurrentes:
@@ -201,65 +327,96 @@ def extraire_titres_sommaire(pdf_path: str, max_pages: int = 7) -> list[str]:
     for titre in titres:
         print(f" - {titre}")
 
-    return titres
-
-def normaliser_texte(t):
-    return re.sub(r'[\W_]+', ' ', t).lower().strip()
+    return titres, lignes_recurrentes
 
-def balise_titres_sections(texte: str, sommaire: list[str]) -> str:
+def extraire_titres_sommaire(pdf_path: str, max_pages: int = 7) -> list[str]:
     """
-    Balise uniquement les titres présents dans le sommaire.
+    Extrait les titres du sommaire d'un PDF sur disque (usage hors ingestion : l'ingestion passe par PDFHandler).
     """
-    lignes = texte.splitlines()
-    lignes_balisees = []
+    if not Path(pdf_path).exists():
+        raise FileNotFoundError(f"❌ Fichier introuvable : {pdf_path}")
 
-    titres_sommaire = set(normaliser_texte(t) for t in sommaire)
+    pages_lines = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[:max_pages]:
+            texte_page = page.extract_text() or ""
+            pages_lines.append([l.strip() for l in texte_page.splitlines() if l.strip()])
 
-    for ligne in lignes:
-        ligne_stripped = ligne.strip().replace('\u00a0', ' ')
-        ligne_stripped = re.sub(r'[\r\n\t\f\v]', '', ligne_stripped)
-        ligne_normalisee = normaliser_texte(ligne_stripped)
+    titres, _ = extraire_sommaire_depuis_pages(pages_lines)
+    return titres
 
-        if ligne_normalisee in titres_sommaire:
-            lignes_balisees.append(f"# {ligne_stripped}")
-        else:
-            lignes_balisees.append(ligne)
-
-    texte_balise = "\n".join(lignes_balisees)
-
-    # Écrit le fichier dans le dossier
-    with open(os.path.join("balises", "texte_balise.txt"), "w", encoding="utf-8") as f:
-        f.write(texte_balise)
-
-    return texte_balise
-
-def regrouper_par_sections(texte_balise: str) -> dict:
-        """
-        Prend un texte balisé (avec # Titre) et retourne un dictionnaire {titre: contenu}.
-        """
-        sections = {}
-        current_title = None
-        current_content = []
-
-        for line in texte_balise.splitlines():
-            if line.strip().startswith("#") and len(line.strip()) > 1:
-                if current_title is not None:
-                    sections[current_title] = "\n".join(current_content).strip()
-                current_title = line.lstrip("#").strip()
-                current_content = []
+def baliser_blocs(blocs: Iterable[Bloc], index: IndexTitres) -> Iterator[Bloc]:
+    """
+    Balisage des titres du sommaire (correspondance tolérante, titres sur plusieurs lignes) : dans chaque
+    paragraphe, les titres de l'index (construit une fois par document) deviennent des blocs titre,
+    les autres lignes restent groupées en paragraphes.
+    """
+    for bloc in blocs:
+        if bloc.type != PARAGRAPHE or not index:
+            yield bloc
+            continue
+        lignes = []
+        for est_titre, texte_ligne in index.baliser_lignes(bloc.texte.splitlines()):
+            if est_titre:
+                if lignes:
+                    yield Bloc(PARAGRAPHE, "\n".join(lignes), bloc.page)
+                    lignes = []
+                yield Bloc(TITRE, texte_ligne, bloc.page)
             else:
-                current_content.append(line)
+                lignes.append(texte_ligne)
+        if lignes:
+            yield Bloc(PARAGRAPHE, "\n".join(lignes), bloc.page)
+
+# À incrémenter à chaque modification du prompt : invalide les résumés mis en cache
+SUMMARY_PROMPT_VERSION = "1"
+
+SUMMARY_PROMPT_TEMPLATE = """Tu es un assistant expert en appels d'offres. Voici un extrait d'un document juridique/technique associé.
+
+Résume ce contenu de manière claire, structurée et concise, en ne conservant **que les informations réellement pertinentes pour comprendre les exigences, prestations attendues, aspects techniques et technologiques, critères contractuels ou autres informations pertinentes à propos du marché**.
 
-        if current_title is not None:
-            sections[current_title] = "\n".join(current_content).strip()
+Ignore les parties répétitives, génériques ou peu informatives. Si l'extrait ne contient rien d'utile, réponds uniquement : " ".
 
-        return sections
+Extrait :
+{chunk}
+
+Résumé :
+"""
 
-async def summarize_section(section_title: str, text: str, llm, chunk_word_limit: int = 1500) -> str:
+async def summarize_chunk(chunk: str, llm, semaphore: asyncio.Semaphore = None, cache=None) -> str:
+    """
+    Résume un chunk via le LLM. En cas d'erreur, renvoie le début du chunk (fallback).
+    Le sémaphore, s'il est fourni, borne le nombre d'appels LLM simultanés.
+    Le cache de résumés, s'il est fourni, est consulté avant tout appel au LLM
+    (accès SQLite dans un thread : la boucle d'événements n'est pas bloquée).
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(chunk, SUMMARY_PROMPT_VERSION, getattr(llm, "model", ""))
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    prompt = SUMMARY_PROMPT_TEMPLATE.format(chunk=chunk)
+    try:
+        if semaphore is None:
+            response = await llm.ainvoke(prompt)
+        else:
+            async with semaphore:
+                response = await llm.ainvoke(prompt)
+        resume = response.strip()
+        # Le fallback d'erreur n'est jamais mis en cache : seul un vrai résumé l'est
+        if cache is not None:
+            await asyncio.to_thread(cache.put, cache_key, resume)
+        return resume
+    except Exception as e:
+        print(f"❌ Erreur dans le résumé d’un chunk : {e}")
+        return chunk[:1000] + "..."
+
+async def summarize_section(section_title: str, text: str, llm, chunk_word_limit: int = 1500, semaphore: asyncio.Semaphore = None, cache=None) -> str:
     """
     Résume une section en ajoutant son titre au début (sans balise #).
     Si le texte est court, on retourne simplement : titre + texte nettoyé.
-    Sinon, on découpe en chunks et on fait appel au LLM.
+    Sinon, on découpe en chunks résumés en parallèle par le LLM (bornés par `semaphore`).
     """
     def nettoyer_texte(t):
         t = re.sub(r'\n\s*\n', '\n\n', t)         # lignes vides multiples → une seule
@@ -274,35 +431,27 @@ async def summarize_section(section_title: str, text: str, llm, chunk_word_limit
     if len(words) <= chunk_word_limit:
         return f"{section_title}\n\n{text}"
 
-    # Sinon, découpage + appel LLM
+    # Sinon, découpage + appels LLM concurrents, résumés réassemblés dans l'ordre des chunks
     nb_chunks = math.ceil(len(words) / chunk_word_limit)
-    resumes = []
-
-    for i in range(nb_chunks):
-        chunk = " ".join(words[i * chunk_word_limit : (i + 1) * chunk_word_limit])
-        prompt = f"""Tu es un assistant expert en appels d'offres. Voici un extrait d'un document juridique/technique associé.
-
-Résume ce contenu de manière claire, structurée et concise, en ne conservant **que les informations réellement pertinentes pour comprendre les exigences, prestations attendues, aspects techniques et technologiques, critères contractuels ou autres informations pertinentes à propos du marché**.
-
-Ignore les parties répétitives, génériques ou peu informatives. Si l'extrait ne contient rien d'utile, réponds uniquement : " ".
+    chunks = [" ".join(words[i * chunk_word_limit : (i + 1) * chunk_word_limit]) for i in range(nb_chunks)]
+    resumes = await asyncio.gather(*(summarize_chunk(chunk, llm, semaphore, cache) for chunk in chunks))
 
-Extrait :
-{chunk}
-
-Résumé :
-"""
-        try:
-            response = await llm.ainvoke(prompt)
-            resume = response.strip()
-            if resume:
-                resumes.append(resume)
-        except Exception as e:
-            print(f"❌ Erreur dans le résumé d’un chunk : {e}")
-            resumes.append(chunk[:1000] + "...")
-
-    resume_final = "\n\n".join(resumes).strip()
+    resume_final = "\n\n".join(resume for resume in resumes if resume).strip()
 
     if not resume_final:
         return f"{section_title}\n\n"
 
     return f"{section_title}\n\n{resume_final}"
+
+async def summarize_sections(sections: list[tuple[str, str]], llm, max_concurrency: int = 4, cache=None, semaphore: asyncio.Semaphore = None) -> list[str]:
+    """
+    Résume toutes les sections d'un document en parallèle.
+    Tous les appels LLM (toutes sections et tous chunks confondus) partagent un même
+    sémaphore de `max_concurrency` slots, à ajuster à la capacité du serveur Ollama.
+    `semaphore` : sémaphore partagé avec les autres documents en cours de résumé ; à défaut, un sémaphore
+    propre à ce document est créé.
+    Les résumés sont renvoyés dans l'ordre des sections.
+    `cache` : cache de résumés optionnel (voir rag.summary_cache.SummaryCache).
+    """
+    semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(*(summarize_section(titre, contenu, llm=llm, semaphore=semaphore, cache=cache) for titre, contenu in sections))
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BucketKey = Tuple[str, FrozenSet[str]]
+
+class CachedAnswer:
+    def __init__(self, vector: np.ndarray, result: dict, version: int):
+        self.vector = vector
+        self.result = result
+        self.version = version
+        self.created_at = time.monotonic()
+
+class SemanticAnswerCache:
+    """
+    Cache de réponses placé devant le pipeline RAG.
+
+    Les entrées sont rangées par (workspace_id, niveaux de confidentialité autorisés) et portent
+    la version d'index du workspace au moment de la question. Une question est servie depuis
+    le cache si son embedding a une similarité cosinus >= `similarity_threshold` avec une
+    question déjà traitée. Éviction LRU (`max_entries`) et expiration (`ttl_seconds`).
+    Toute ingestion dans un workspace incrémente sa version et vide ses entrées.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 3600):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._buckets: Dict[BucketKey, "OrderedDict[int, CachedAnswer]"] = {}
+        # Ordre LRU global, toutes partitions confondues
+        self._lru: "OrderedDict[Tuple[BucketKey, int], None]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _bucket_key(workspace_id: str, allowed_levels: Iterable) -> BucketKey:
+        return workspace_id, frozenset(getattr(level, "value", level) for level in allowed_levels)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def version(self, workspace_id: str) -> int:
+        return self._versions.get(workspace_id, 0)
+
+    def get(self, workspace_id: str, allowed_levels: Iterable, query_vector) -> Optional[dict]:
+        key = self._bucket_key(workspace_id, allowed_levels)
+        vector = self._normalize(query_vector)
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket:
+                for entry_id in [entry_id for entry_id, entry in bucket.items() if now - entry.created_at > self.ttl_seconds]:
+                    self._remove(key, entry_id)
+
+            if not bucket:
+                self.misses += 1
+                return None
+
+            entry_ids = list(bucket)
+            similarities = np.stack([bucket[entry_id].vector for entry_id in entry_ids]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_id = entry_ids[best]
+            self._lru.move_to_end((key, entry_id))
+            self.hits += 1
+            logger.info(f"♻️ Réponse servie depuis le cache (similarité {similarities[best]:.3f})")
+            return bucket[entry_id].result
+
+    def put(self, workspace_id: str, allowed_levels: Iterable, query_vector, result: dict, version: int):
+        """
+        Enregistre une réponse. `version` est la version d'index lue avant de lancer le pipeline :
+        si une ingestion a eu lieu entre-temps, la réponse est déjà périmée et n'est pas conservée.
+        """
+        key = self._bucket_key(workspace_id, allowed_levels)
+        with self._lock:
+            if version != self.version(workspace_id):
+                return
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._buckets.setdefault(key, OrderedDict())[entry_id] = CachedAnswer(self._normalize(query_vector), result, version)
+            self._lru[(key, entry_id)] = None
+
+            while len(self._lru) > self.max_entries:
+                (old_key, old_id), _ = self._lru.popitem(last=False)
+                self._remove(old_key, old_id)
+
+    def invalidate_workspace(self, workspace_id: str):
+        with self._lock:
+            self._versions[workspace_id] = self.version(workspace_id) + 1
+            for key in [key for key in self._buckets if key[0] == workspace_id]:
+                for entry_id in list(self._buckets[key]):
+                    self._remove(key, entry_id)
+        logger.info(f"🧹 Cache de réponses invalidé pour le workspace {workspace_id}")
+
+    def _remove(self, key: BucketKey, entry_id: int):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.pop(entry_id, None)
+            if not bucket:
+                del self._buckets[key]
+        self._lru.pop((key, entry_id), None)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._lru)}
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingDiskCache:
+    """
+    Tier disque du cache d'embeddings : table SQLite {clé -> vecteur float32 brut}.
+
+    La taille est bornée à `max_entries` vecteurs : au dépassement, les moins récemment utilisés
+    sont évincés par lot, jusqu'à `eviction_ratio` de la borne (comme SummaryCache).
+    """
+
+    def __init__(self, path: str, max_entries: int = 200000, eviction_ratio: float = 0.9):
+        self.path = path
+        self.max_entries = max_entries
+        self.eviction_ratio = eviction_ratio
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL DEFAULT 0)"
+        )
+        # Cache créé avant la borne de taille : colonne d'accès ajoutée, entrées existantes évincées en premier
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "last_access" not in columns:
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # Par paquets pour rester sous la limite de paramètres SQLite
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, vector in items.items():
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                    (key, vector.tobytes(), now)
+                )
+                if cursor.rowcount:
+                    self._count += 1
+                else:
+                    self._conn.execute("UPDATE embeddings SET vector = ?, last_access = ? WHERE key = ?", (vector.tobytes(), now, key))
+            if self._count > self.max_entries:
+                excess = self._count - int(self.max_entries * self.eviction_ratio)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (excess,)
+                )
+                self._count -= excess
+                logger.info(f"🧹 {excess} embedding(s) évincé(s) du cache disque")
+            self._conn.commit()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Enveloppe d'un modèle d'embeddings LangChain avec cache à deux niveaux :
+    - mémoire : LRU borné à `max_entries` vecteurs ;
+    - disque (optionnel) : SQLite de vecteurs float32 (`disk_path`), borné à `disk_max_entries` vecteurs.
+
+    La clé est le SHA-256 de (nom du modèle, type d'embedding, texte) : les embeddings
+    de requête et de document d'un même texte peuvent différer (préfixes d'instruction).
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, max_entries: int = 10000, disk_path: Optional[str] = None, disk_max_entries: int = 200000):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk = EmbeddingDiskCache(disk_path, max_entries=disk_max_entries) if disk_path else None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup_memory(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+        return found
+
+    def _lookup_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        # Appel bloquant (SELECT SQLite) : exécuté dans un thread par les variantes async
+        if self.disk is None or not keys:
+            return {}
+        on_disk = self.disk.get_many(keys)
+        if on_disk:
+            self._remember(on_disk)
+            with self._lock:
+                self.disk_hits += len(on_disk)
+        return on_disk
+
+    def _store_disk(self, items: Dict[str, np.ndarray]):
+        # Appel bloquant (INSERT + commit SQLite) : exécuté dans un thread par les variantes async
+        if self.disk is not None:
+            self.disk.put_many(items)
+
+    def _remember(self, items: Dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in items.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _prepare(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup_memory(list(dict.fromkeys(keys)))
+        return keys, found
+
+    def _missing(self, keys: List[str], texts: List[str], found: Dict[str, np.ndarray]) -> Dict[str, str]:
+        # Textes absents du cache, dédoublonnés, dans l'ordre d'apparition
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return missing
+
+    def _computed(self, missing: Dict[str, str], vectors: List[List[float]]) -> Dict[str, np.ndarray]:
+        computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+        self._remember(computed)
+        with self._lock:
+            self.misses += len(computed)
+        return computed
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys, found = self._prepare(kind, texts)
+        found.update(self._lookup_disk([key for key in dict.fromkeys(keys) if key not in found]))
+        return keys, found, self._missing(keys, texts, found)
+
+    async def _alookup(self, kind: str, texts: List[str]):
+        # Mémoire consultée sur la boucle, disque dans un thread (le verrou SQLite est partagé avec l'indexation)
+        keys, found = self._prepare(kind, texts)
+        absent = [key for key in dict.fromkeys(keys) if key not in found]
+        if self.disk is not None and absent:
+            found.update(await asyncio.to_thread(self._lookup_disk, absent))
+        return keys, found, self._missing(keys, texts, found)
+
+    def _finish(self, keys: List[str], found: Dict[str, np.ndarray], missing: Dict[str, str], vectors: List[List[float]]) -> List[List[float]]:
+        computed = self._computed(missing, vectors)
+        self._store_disk(computed)
+        found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    async def _afinish(self, keys: List[str], found: Dict[str, np.ndarray], missing: Dict[str, str], vectors: List[List[float]]) -> List[List[float]]:
+        computed = self._computed(missing, vectors)
+        if self.disk is not None and computed:
+            await asyncio.to_thread(self._store_disk, computed)
+        found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup("document", texts)
+        vectors = self.embeddings.embed_documents(list(missing.values())) if missing else []
+        return self._finish(keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._lookup("query", [text])
+        vectors = [self.embeddings.embed_query(text)] if missing else []
+        return self._finish(keys, found, missing, vectors)[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await self._alookup("document", texts)
+        vectors = await self.embeddings.aembed_documents(list(missing.values())) if missing else []
+        return await self._afinish(keys, found, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = await self._alookup("query", [text])
+        vectors = [await self.embeddings.aembed_query(text)] if missing else []
+        return (await self._afinish(keys, found, missing, vectors))[0]
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_entries": self.disk._count if self.disk is not None else 0
+        }
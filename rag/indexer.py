@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+class BatchIndexer:
+    """
+    Indexation des chunks par lots, à mémoire bornée :
+    - les embeddings sont calculés par paquets de `embed_batch_size` chunks ;
+    - chaque paquet est écrit via l'import par lots de Weaviate (taille dynamique, `batch_size` initiale) ;
+    - les objets rejetés sont renvoyés jusqu'à `max_retries` fois, avec un délai croissant.
+
+    Seul le paquet en cours (textes, vecteurs, propriétés) est gardé en mémoire.
+    """
+
+    def __init__(self, client, embeddings, index_name: str = "AO", text_key: str = "text", attributes: Optional[List[str]] = None, embed_batch_size: int = 64, batch_size: int = 100, dynamic: bool = True, max_retries: int = 3, retry_delay: float = 1.0):
+        self.client = client
+        self.embeddings = embeddings
+        self.index_name = index_name
+        self.text_key = text_key
+        self.attributes = [a for a in (attributes or []) if a != text_key]
+        self.embed_batch_size = embed_batch_size
+        self.batch_size = batch_size
+        self.dynamic = dynamic
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # Le batch Weaviate du client est partagé : une seule écriture à la fois (les embeddings se font hors verrou)
+        self._lock = threading.Lock()
+        self._errors: Dict[str, str] = {}
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, **kwargs) -> "BatchIndexer":
+        return cls(vectorstore._client, vectorstore._embedding, vectorstore._index_name, vectorstore._text_key, vectorstore._query_attrs, **kwargs)
+
+    def _properties(self, doc: Document) -> dict:
+        properties = {key: getattr(value, "value", value) for key, value in doc.metadata.items()}
+        properties[self.text_key] = doc.page_content
+        return properties
+
+    def _on_batch_results(self, results):
+        # Callback Weaviate après chaque requête : on note les objets rejetés
+        for item in results or []:
+            errors = (item.get("result") or {}).get("errors")
+            if errors:
+                self._errors[item.get("id")] = str(errors)
+
+    def _configure(self):
+        self.client.batch.configure(
+            batch_size=self.batch_size,
+            dynamic=self.dynamic,
+            timeout_retries=self.max_retries,
+            connection_error_retries=self.max_retries,
+            callback=self._on_batch_results
+        )
+
+    def _write(self, objects: Dict[str, tuple]) -> Tuple[Dict[str, tuple], Optional[str]]:
+        """
+        Écrit les objets {uuid: (propriétés, vecteur)} sous le verrou du batch partagé ;
+        renvoie (objets en échec, première erreur).
+        """
+        with self._lock:
+            self._configure()
+            self._errors = {}
+            try:
+                with self.client.batch as batch:
+                    for object_id, (properties, vector) in objects.items():
+                        batch.add_data_object(properties, self.index_name, uuid=object_id, vector=vector)
+            except Exception as e:
+                # Requête entière en échec (connexion, timeout) : tout le paquet est à renvoyer
+                logger.warning(f"⚠️ Import par lots en échec : {e}")
+                return objects, str(e)
+            errors = self._errors
+        return {object_id: objects[object_id] for object_id in errors if object_id in objects}, next(iter(errors.values()), None)
+
+    def _paquets(self, chunks: Iterable[Document], vectors: Optional[Iterable]) -> Iterator[List[tuple]]:
+        paquet = []
+        pairs = zip(chunks, vectors) if vectors is not None else ((chunk, None) for chunk in chunks)
+        for pair in pairs:
+            paquet.append(pair)
+            if len(paquet) >= self.embed_batch_size:
+                yield paquet
+                paquet = []
+        if paquet:
+            yield paquet
+
+    def _embed(self, paquet: List[tuple]) -> List[list]:
+        # Seuls les chunks sans vecteur connu (ex. réutilisé d'une version précédente) sont envoyés au modèle
+        missing = [i for i, (_, vector) in enumerate(paquet) if vector is None]
+        vectors = [vector for _, vector in paquet]
+        if missing:
+            embedded = self.embeddings.embed_documents([paquet[i][0].page_content for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        return vectors
+
+    def index(self, chunks: Iterable[Document], vectors: Optional[Iterable] = None) -> dict:
+        """
+        Indexe les chunks (liste ou générateur) et renvoie le bilan.
+        `vectors`, aligné sur `chunks`, fournit les vecteurs déjà connus (None : à calculer).
+
+        Bilan :
+        {"status": "ok" | "partial" | "no_chunks", "chunks_indexed", "failed", "failed_hashes", "chunks_per_second"}
+        `failed_hashes` : hashes des documents dont au moins un chunk n'a pas pu être écrit.
+        """
+        indexed = 0
+        failed = 0
+        failed_hashes: Set[str] = set()
+        started = time.perf_counter()
+
+        for num, paquet in enumerate(self._paquets(chunks, vectors), start=1):
+            t0 = time.perf_counter()
+            paquet_vectors = self._embed(paquet)
+            t_embed = time.perf_counter() - t0
+
+            objects = {
+                str(uuid.uuid4()): (self._properties(doc), vector)
+                for (doc, _), vector in zip(paquet, paquet_vectors)
+            }
+            pending, error = self._write(objects)
+            for attempt in range(1, self.max_retries + 1):
+                if not pending:
+                    break
+                logger.warning(f"🔁 Paquet {num} : {len(pending)} objet(s) rejeté(s), nouvel essai {attempt}/{self.max_retries}")
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                pending, error = self._write(pending)
+
+            if pending:
+                logger.error(f"❌ Paquet {num} : {len(pending)} objet(s) non indexé(s) : {error or 'échec de la requête'}")
+                failed += len(pending)
+                failed_hashes.update(properties.get("hash") for properties, _ in pending.values())
+
+            indexed += len(objects) - len(pending)
+            elapsed = time.perf_counter() - t0
+            logger.info(
+                f"📦 Paquet {num} : {len(objects) - len(pending)}/{len(objects)} chunk(s) en {elapsed:.2f}s "
+                f"(embeddings {t_embed:.2f}s, {len(objects) / elapsed:.1f} chunks/s)"
+            )
+
+        if indexed == 0 and failed == 0:
+            logger.warning("⚠️ Aucun chunk à indexer.")
+            return {"status": "no_chunks"}
+
+        total_elapsed = time.perf_counter() - started
+        rate = indexed / total_elapsed if total_elapsed > 0 else 0.0
+        logger.info(f"✅ {indexed} chunk(s) indexé(s) en {total_elapsed:.2f}s ({rate:.1f} chunks/s), {failed} en échec")
+        return {
+            "status": "ok" if failed == 0 else "partial",
+            "chunks_indexed": indexed,
+            "failed": failed,
+            "failed_hashes": sorted(h for h in failed_hashes if h),
+            "chunks_per_second": round(rate, 1)
+        }
+
+    def delete_by_hashes(self, hashes: Iterable[str]) -> int:
+        """
+        Suppression en masse de tous les chunks des documents `hashes` (une requête).
+        """
+        hashes = sorted(set(hashes))
+        if not hashes:
+            return 0
+        with self._lock:
+            result = self.client.batch.delete_objects(
+                class_name=self.index_name,
+                where={"path": ["hash"], "operator": "ContainsAny", "valueTextArray": hashes}
+            )
+        deleted = (result or {}).get("results", {}).get("successful", 0)
+        logger.info(f"🗑️ {deleted} chunk(s) supprimé(s) pour {len(hashes)} document(s)")
+        return deleted
+
+    def fetch_section_chunks(self, file_hash: str, section_hashes: Set[str], page_size: int = 500) -> Dict[str, List[List[Tuple[Document, list]]]]:
+        """
+        Chunks (avec leur vecteur) du document `file_hash` appartenant aux sections `section_hashes`.
+        Par hash de section : un groupe de chunks par occurrence de la section dans le document
+        (sections identiques répétées), groupes dans l'ordre des section_idx, chunks dans l'ordre du document.
+        """
+        section_hashes = sorted(set(section_hashes))
+        if not section_hashes:
+            return {}
+        where = {
+            "operator": "And",
+            "operands": [
+                {"path": ["hash"], "operator": "Equal", "valueText": file_hash},
+                {"path": ["section_hash"], "operator": "ContainsAny", "valueTextArray": section_hashes}
+            ]
+        }
+
+        found: Dict[Tuple[str, int], List[Tuple[Document, list]]] = {}
+        offset = 0
+        while True:
+            result = self.client.query.get(self.index_name, [self.text_key] + self.attributes) \
+                .with_where(where) \
+                .with_additional(["vector"]) \
+                .with_limit(page_size) \
+                .with_offset(offset) \
+                .do()
+            objects = result.get("data", {}).get("Get", {}).get(self.index_name, []) or []
+            for obj in objects:
+                vector = obj.pop("_additional", {}).get("vector")
+                text = obj.pop(self.text_key, "")
+                metadata = {key: value for key, value in obj.items() if value is not None}
+                cle = (metadata.get("section_hash"), metadata.get("section_idx", 0))
+                found.setdefault(cle, []).append((Document(page_content=text, metadata=metadata), vector))
+            if len(objects) < page_size:
+                break
+            offset += page_size
+
+        groupes: Dict[str, List[List[Tuple[Document, list]]]] = {}
+        for (h, _), chunks in sorted(found.items(), key=lambda item: item[0][1]):
+            chunks.sort(key=lambda item: item[0].metadata.get("chunk_index", 0))
+            groupes.setdefault(h, []).append(chunks)
+        return groupes
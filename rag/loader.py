@@ -1,24 +1,27 @@
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from schemas.user_schema import ConfidentialityLevel
+import asyncio
 import logging
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import hashlib
-logging.getLogger("fitz").setLevel(logging.ERROR)
+logging.getLogger("pdfminer").setLevel(logging.ERROR)
 import re
-from typing import List, Tuple
 from .Handler.PDFHandler import PDFHandler
 from .Handler.WordHandler import WordHandler
 from .Handler.MarkdownHandler import MarkdownHandler
+from .Handler.preprocessing import summarize_sections
+from .indexer import BatchIndexer
+from .token_chunker import TokenChunker
 
 # Initialisation du logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_handler_for_file(filename: str, file_bytes: bytes):
+def get_handler_for_file(filename: str, file_bytes, extraction_executor=None):
     # Vérifie l'extension du fichier et instancie le bon handler
     if filename.endswith('.pdf'):
-        return PDFHandler(file_bytes)  # Assurez-vous de passer file_bytes ici
+        return PDFHandler(file_bytes, executor=extraction_executor)  # Extraction parallèle si un pool est fourni
     elif filename.endswith('.docx'):
         return WordHandler(file_bytes)  # Pour Word aussi, il faudrait passer file_bytes
     elif filename.endswith('.md'):  # Vérification pour le format Markdown
@@ -32,80 +35,103 @@ def compute_sha256(content: bytes) -> str:
     """
     return hashlib.sha256(content).hexdigest()
 
-
-async def load_document_with_hash(filename: str, file_bytes: bytes, workspace_id: str, confidentiality: ConfidentialityLevel, vectorstore, llm) -> Tuple[str, str, str, str, str] :
+async def extract_sections(filename: str, content, extraction_executor=None) -> List[Tuple[str, str]]:
     """
-    Identifie le type de document
-    Sélectionne le bon handler
-    Appelle la fonction load qui correspond pour chargé le texte résumé balisé
-    Renvoie le texte résumé balisé avec les metadata
+    Étape d'extraction par flux de blocs : sections (titre, contenu) du document, dans l'ordre.
+    Seule la liste des sections est conservée (ni texte complet, ni texte balisé intermédiaire).
     """
-    logger.info(f"📄 Chargement du fichier : {filename}")
-
-    try:
-        handler = get_handler_for_file(filename, file_bytes)
+    handler = get_handler_for_file(filename, content, extraction_executor)
+    return [section async for section in handler.sections(filename)]
 
-        # Maintenant on va vérifier si on doit ouvrir le fichier en binaire ou en texte
-        if filename.endswith('.md'):  # Si c'est un fichier Markdown
-            # Ouvrir en mode texte pour les fichiers Markdown
-            with open(filename, "r") as f:
-                file_text = f.read()
-            file_bytes = file_text.encode('utf-8')  # Convertir le texte en bytes si nécessaire pour la signature
-
-        else:
-            # Sinon, on ouvre en mode binaire pour PDF ou DOCX
-            with open(filename, "rb") as f:
-                file_bytes = f.read()
-
-        file_hash = compute_sha256(file_bytes)
-        logger.info(f"🔑 Hash SHA-256 calculé : {file_hash}")
-        
-        query_result = vectorstore._client.query.get("AO", ["hash"]).with_where({
-            "path": ["hash"],
-            "operator": "Equal",
-            "valueText": file_hash
-        }).with_limit(1).do()
+def section_hash(title: str, content: str) -> str:
+    """
+    Hash du contenu extrait d'une section (titre + texte, espaces normalisés) :
+    identique d'une version du document à l'autre tant que la section n'est pas modifiée.
+    """
+    normalized = re.sub(r"\s+", " ", f"{title}\n{content}").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
 
-        hits = query_result.get("data", {}).get("Get", {}).get("AO", [])
-        if hits:
-            logger.warning(f"⚠️ Doublon détecté : {filename}, hash : {file_hash}")
-            return None
+def hash_sections(sections: List[Tuple[str, str]]) -> List[str]:
+    return [section_hash(title, content) for title, content in sections]
 
-        # 💡 Nouvelle extraction mixée, ordonnée
-        texte_résumé_balisé = await handler.load(filename, llm)  # Chargement via le handler
+def match_reused_sections(section_hashes: List[str], fetched: Dict[str, List[List[Tuple[Document, list]]]]) -> Dict[int, List[Tuple[Document, list]]]:
+    """
+    Associe chaque section inchangée (position dans le document) aux chunks de la version précédente :
+    la k-ième occurrence d'un hash de section reçoit le k-ième groupe de ce hash (voir
+    BatchIndexer.fetch_section_chunks). Chaque groupe n'est utilisé qu'une fois ; une occurrence
+    sans groupe correspondant est traitée comme une section nouvelle.
+    """
+    occurrences: Dict[str, int] = {}
+    reused = {}
+    for i, h in enumerate(section_hashes):
+        groupes = fetched.get(h, [])
+        k = occurrences.get(h, 0)
+        occurrences[h] = k + 1
+        if k < len(groupes):
+            reused[i] = groupes[k]
+    return reused
+
+async def summarize_changed_sections(sections: List[Tuple[str, str]], reused_sections: Set[int], llm, summary_concurrency: int = 4, summary_cache=None, summary_semaphore: asyncio.Semaphore = None) -> List[Tuple[str, str]]:
+    """
+    Résume seulement les sections dont la position n'est pas dans `reused_sections` (sections modifiées ou nouvelles).
+    Renvoie [(titre, résumé)] dans l'ordre du document ; résumé vide pour une section réutilisée,
+    qui garde ainsi sa place dans la numérotation section_idx.
+    """
+    changed = [i for i in range(len(sections)) if i not in reused_sections]
+    resumes = await summarize_sections([sections[i] for i in changed], llm, max_concurrency=summary_concurrency, cache=summary_cache, semaphore=summary_semaphore)
 
-        source = filename
+    par_section = [""] * len(sections)
+    for i, resume in zip(changed, resumes):
+        par_section[i] = resume
+    return [(title, resume) for (title, _), resume in zip(sections, par_section)]
 
-        return texte_résumé_balisé, source, file_hash, workspace_id, confidentiality
+def merge_reused_chunks(chunks: List[Document], reused: Dict[int, List[Tuple[Document, list]]], sections: List[Tuple[str, str]], source: str, hash: str, workspace_id: str, confidentiality: ConfidentialityLevel) -> Tuple[List[Document], List[Optional[list]]]:
+    """
+    Fusionne, dans l'ordre du document, les nouveaux chunks et ceux réutilisés de la version précédente
+    (`reused` : position de la section -> chunks, voir match_reused_sections), rattachés au nouveau hash
+    et à leur nouvelle section, puis renumérote chunk_index.
+    Renvoie (chunks, vecteurs) : vecteur None pour un chunk à embedder.
+    """
+    merged = [(chunk.metadata["section_idx"], n, chunk, None) for n, chunk in enumerate(chunks)]
+    for i, group in reused.items():
+        title = sections[i][0]
+        for n, (chunk, vector) in enumerate(group):
+            metadata = dict(chunk.metadata)
+            metadata.update({
+                "source": source,
+                "hash": hash,
+                "section_title": title,
+                "section_idx": i + 1,
+                "workspace_id": workspace_id,
+                "confidentiality": confidentiality
+            })
+            merged.append((i + 1, n, Document(page_content=chunk.page_content, metadata=metadata), vector))
 
-    except Exception as e:
-        logger.error(f"❌ Erreur lors du chargement du fichier {filename} : {e}")
-        return None
+    merged.sort(key=lambda item: (item[0], item[1]))
+    for idx, (_, _, chunk, _) in enumerate(merged):
+        chunk.metadata["chunk_index"] = idx
+    return [chunk for _, _, chunk, _ in merged], [vector for _, _, _, vector in merged]
 
-def split_documents(texte_résumé_balisé: str, source: str, hash: str, workspace_id: str, confidentiality: ConfidentialityLevel, chunk_size: int = 500, overlap: int = 55) -> List[Document]:
+def split_sections(sections: Iterable[Tuple[str, str]], source: str, hash: str, workspace_id: str, confidentiality: ConfidentialityLevel, chunk_size: int = 500, overlap: int = 55, section_hashes: List[str] = None, first_section_idx: int = 1, chunker: TokenChunker = None) -> Iterator[Document]:
     """
-    Découpe un texte balisé (# Titre) en chunks avec métadonnées.
-    - Section "Introduction" traitée avant la première balise.
-    - Chaque chunk porte les métadonnées de sa section.
+    Découpe des sections (titre, texte résumé) en chunks avec métadonnées, section par section,
+    au fur et à mesure de la consommation du générateur.
+    - Chaque chunk porte les métadonnées de sa section (section_idx à partir de `first_section_idx`).
+    - `section_hashes[i]` : hash du contenu extrait de la section i + 1 (voir hash_sections), stocké en section_hash.
+    - `chunker` : découpage en tokens sous les budgets des modèles (voir TokenChunker) ; à défaut,
+      découpage en caractères (`chunk_size`, `overlap`).
     """
-
-    splitter = RecursiveCharacterTextSplitter(
+    splitter = chunker or RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=overlap,
         separators=["\n\n", "\n", ".", "!", "?"]
     )
 
-    chunks = []
     idx = 0
-    section_idx = 0
-    current_title = "Introduction"
-    buffer = []
-
-    def flush_buffer(title: str, content_lines, section_idx):
-        nonlocal idx
-        text = "\n".join(content_lines).strip()
+    for section_idx, (title, content) in enumerate(sections, start=first_section_idx):
+        text = content.strip()
         if not text:
-            return
+            continue
         for chunk in splitter.split_text(text):
             metadata = {
                 "chunk_index": idx,
@@ -113,43 +139,25 @@ def split_documents(texte_résumé_balisé: str, source: str, hash: str, workspa
                 "hash": hash,
                 "section_title": title,
                 "section_idx": section_idx,
+                "section_hash": section_hashes[section_idx - 1] if section_hashes and 0 < section_idx <= len(section_hashes) else "",
                 "workspace_id": workspace_id,
                 "confidentiality": confidentiality
             }
-            chunks.append(Document(page_content=chunk.strip(), metadata=metadata))
+            yield Document(page_content=chunk.strip(), metadata=metadata)
             idx += 1
 
-    for line in texte_résumé_balisé.splitlines():
-        match = re.match(r"^# (.+)$", line.strip())
-        if match:
-            # On flush le buffer de l'ancienne section
-            flush_buffer(current_title, buffer, section_idx)
-            # Nouvelle section
-            current_title = match.group(1).strip()
-            section_idx += 1
-            buffer = []
-        else:
-            buffer.append(line)
-
-    # Dernier flush (fin de fichier)
-    flush_buffer(current_title, buffer, section_idx)
-
-    return chunks
-
-def index_documents(chunks: List[Document], vectorstore):
+def index_documents(chunks: List[Document], vectorstore, indexer: BatchIndexer = None, vectors: List[Optional[list]] = None):
     """
-    Indexe une liste de chunks dans le vectorstore.
+    Indexe une liste de chunks dans le vectorstore, par lots (embeddings puis import Weaviate).
+    `indexer` : BatchIndexer configuré (taille des lots, essais) ; à défaut, construit depuis le vectorstore.
+    `vectors` : vecteurs déjà connus, alignés sur `chunks` (None : à calculer).
     """
     if not chunks:
         logger.warning("⚠️ Aucun chunk à indexer.")
         return {"status": "no_chunks"}
     try:
-        vectorstore.add_documents(chunks)
-        chunk = chunks[0]
-        print("Contenu du chunk")
-        print(chunk.page_content)
-        logger.info(f"✅ {len(chunks)} chunk(s) indexé(s) avec succès.")
-        return {"status": "ok", "chunks_indexed": len(chunks)}
+        indexer = indexer or BatchIndexer.from_vectorstore(vectorstore)
+        return indexer.index(chunks, vectors)
     except Exception as e:
         logger.error(f"❌ Échec de l’indexation : {e}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
@@ -1,13 +1,20 @@
+import asyncio
 import logging
-from typing import List
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+from collections import defaultdict
+from concurrent.futures import Executor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
 from langchain.schema import Document
+from .reranker import get_reranker
+from .title_cache import SectionTitleCache
 
 logging.basicConfig(level=logging.DEBUG)  # au lieu de INFO
 logger = logging.getLogger(__name__)
+
+# Réponse renvoyée à l'utilisateur quand le traitement d'une question échoue
+MESSAGE_ERREUR = "Une erreur s'est produite lors du traitement de la question."
    
-def rerank_documents(query: str, documents: List[Document], model_name, top_k: int = 5) -> List:
+def rerank_documents(query: str, documents: List[Document], model_name, top_k: int = 5, batch_size: int = None) -> List:
     """
     Rerank documents using a CrossEncoder model (like BGE-Reranker, MS-MARCO, etc.)
 
@@ -16,62 +23,109 @@ def rerank_documents(query: str, documents: List[Document], model_name, top_k: i
         documents (List): A list of documents, each having `.page_content`.
         model_name: Model name (string) or already loaded model.
         top_k (int): Number of top documents to return.
+        batch_size (int): Micro-batch size for scoring (defaults to the reranker's own).
     Returns:
         List: Top-k reranked documents.
     """
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
-
-    device = ("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
-    model.eval()
+    reranker = get_reranker(model_name)
 
-    scores = []
     logger.info(f"💡 Début du reranking avec {len(documents)} documents pour la query: '{query}'")
-    for doc in documents:
-        inputs = tokenizer(query, doc.page_content, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            score = logits[0][0].item() if logits.shape[1] == 1 else logits[0][1].item()
-        scores.append(score)
+    scores = reranker.score(query, [doc.page_content for doc in documents], batch_size=batch_size)
 
-    reranked = [doc for _, doc in sorted(zip(scores, documents), key=lambda x: x[0], reverse=True)]
-    return reranked[:top_k]
+    # Tri stable par score décroissant
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [documents[i] for i in order]
 
-def get_neighbors(chunk, all_chunks, k=2):
+class NeighborIndex:
     """
-    Retourne les k voisins gauche/droite d’un chunk donné, sans inclure le chunk lui-même.
+    Index des chunks par (source, section_title), chaque groupe étant trié par chunk_index.
+    Construit une fois par requête : la recherche des voisins d'un chunk devient une simple tranche.
     """
-    doc_source = chunk.metadata["source"]
-    chunk_idx = chunk.metadata["chunk_index"]
-    section_title = chunk.metadata["section_title"]
-    
-    # Filtrer les chunks du même document et avec le même titre de section
-    same_doc_chunks = [c for c in all_chunks if c.metadata["source"] == doc_source and c.metadata["section_title"] == section_title]
-    same_doc_chunks.sort(key=lambda x: x.metadata["chunk_index"])
 
-    idx = next((i for i, c in enumerate(same_doc_chunks) if c.metadata["chunk_index"] == chunk_idx), None)
+    def __init__(self, chunks: List[Document]):
+        groups = defaultdict(dict)
+        for chunk in chunks:
+            key = (chunk.metadata["source"], chunk.metadata["section_title"])
+            # Un même chunk peut arriver deux fois (candidats + voisins récupérés dans le store)
+            groups[key][chunk.metadata["chunk_index"]] = chunk
+
+        self._groups: Dict[Tuple[str, str], List[Document]] = {}
+        self._positions: Dict[Tuple[str, int], int] = {}
+        for key, by_index in groups.items():
+            ordered = [by_index[idx] for idx in sorted(by_index)]
+            self._groups[key] = ordered
+            for position, chunk in enumerate(ordered):
+                self._positions[(chunk.metadata["source"], chunk.metadata["chunk_index"])] = position
+
+    def neighbors(self, chunk, k: int = 2) -> List[Document]:
+        group = self._groups.get((chunk.metadata["source"], chunk.metadata["section_title"]))
+        position = self._positions.get((chunk.metadata["source"], chunk.metadata["chunk_index"]))
+        if group is None or position is None:
+            return []
+
+        # Voisins à gauche puis à droite
+        return group[max(0, position - k):position] + group[position + 1:position + 1 + k]
+
+def get_neighbors(chunk, all_chunks, k=2, index: NeighborIndex = None):
+    """
+    Retourne les k voisins gauche/droite d’un chunk donné, sans inclure le chunk lui-même.
+    Passer un `NeighborIndex` déjà construit évite de retrier `all_chunks` à chaque appel.
+    """
+    if index is None:
+        index = NeighborIndex(all_chunks)
+    return index.neighbors(chunk, k)
 
-    if idx is None:
+def fetch_neighbors_from_store(weaviate_client, chunks: List[Document], k: int = 2, where_filter: dict = None) -> List[Document]:
+    """
+    Récupère dans Weaviate, en une seule requête, les chunks situés à ±k positions (chunk_index)
+    des chunks donnés, dans le même document et la même section, qu'ils aient ou non
+    fait partie des candidats de la recherche vectorielle.
+    """
+    if not chunks:
         return []
 
+    ranges = [
+        {
+            "operator": "And",
+            "operands": [
+                {"path": ["hash"], "operator": "Equal", "valueText": chunk.metadata["hash"]},
+                {"path": ["section_title"], "operator": "Equal", "valueText": chunk.metadata["section_title"]},
+                {"path": ["chunk_index"], "operator": "GreaterThanEqual", "valueInt": chunk.metadata["chunk_index"] - k},
+                {"path": ["chunk_index"], "operator": "LessThanEqual", "valueInt": chunk.metadata["chunk_index"] + k}
+            ]
+        }
+        for chunk in chunks
+    ]
+    where = ranges[0] if len(ranges) == 1 else {"operator": "Or", "operands": ranges}
+    if where_filter:
+        where = {"operator": "And", "operands": [where_filter, where]}
+
+    attributes = [name for name in chunks[0].metadata if name != "text"]
+    result = weaviate_client.query.get("AO", ["text"] + attributes) \
+        .with_where(where) \
+        .with_limit(len(chunks) * (2 * k + 1)) \
+        .do()
+
+    hits = result.get("data", {}).get("Get", {}).get("AO", []) or []
     neighbors = []
-    
-    left_neighbors = same_doc_chunks[max(0, idx - k):idx]
-    neighbors.extend(left_neighbors)
-
-    # Voisins à droite
-    right_neighbors = same_doc_chunks[idx + 1:idx + 1 + k]
-    neighbors.extend(right_neighbors)
+    for hit in hits:
+        text = hit.pop("text", "")
+        neighbors.append(Document(page_content=text, metadata=hit))
 
+    logger.info(f"🧱 {len(neighbors)} voisin(s) récupéré(s) depuis Weaviate.")
     return neighbors
 
-def build_context(reranked_docs, all_chunks, k_neighbors=2, min_chunks=16):
+def build_context(reranked_docs, all_chunks, k_neighbors=2, min_chunks=16, weaviate_client=None, where_filter: dict = None):
     """
     Construit un contexte enrichi à partir des top documents reranked,
     en ajoutant leurs voisins gauche/droite (via get_neighbors),
     jusqu'à atteindre un minimum de `min_chunks` uniques.
+    Si `weaviate_client` est fourni, les voisins absents des candidats sont récupérés dans le store.
     """
+    if weaviate_client is not None:
+        all_chunks = list(all_chunks) + fetch_neighbors_from_store(weaviate_client, reranked_docs, k=k_neighbors, where_filter=where_filter)
+    neighbor_index = NeighborIndex(all_chunks)
+
     enriched_chunks = []
     seen = set()
     total_chunks = 0
@@ -91,7 +145,7 @@ def build_context(reranked_docs, all_chunks, k_neighbors=2, min_chunks=16):
             logger.info(f"🧱 Ajout doc principal : {key}")
 
         # Ajouter ses voisins gauche/droite
-        neighbors = get_neighbors(doc, all_chunks, k=k_neighbors)
+        neighbors = get_neighbors(doc, all_chunks, k=k_neighbors, index=neighbor_index)
         logger.info(f"🧱 Voisins trouvés pour {key} : {len(neighbors)}")
 
         for neighbor in neighbors:
@@ -134,77 +188,59 @@ def build_context(reranked_docs, all_chunks, k_neighbors=2, min_chunks=16):
 
     return contexte, enriched_chunks
 
-def find_most_relevant_sections(question: str, sections: List[str], model_name: str, top_k: int = 3) -> List[str]:
+def score_sections(question: str, sections: List[str], model_name, batch_size: int = None) -> List[Tuple[str, float]]:
     """
-    Trouve les sections les plus pertinentes en fonction de la similarité entre la question et chaque titre de section.
+    Score chaque titre de section une seule fois face à la question.
+    Le résultat alimente à la fois la décision de filtrage et la sélection des top-k sections.
 
     Args:
         question (str): La question posée par l'utilisateur.
         sections (List[str]): Liste de titres de section (strings).
-        model_name (str): Le nom du modèle utilisé pour calculer la similarité.
-        top_k (int): Le nombre de sections les plus pertinentes à renvoyer.
+        model_name: Nom du modèle (string) ou reranker déjà chargé.
+        batch_size (int): Taille des micro-batchs de scoring (par défaut celle du reranker).
 
     Returns:
-        List[str]: Liste des top-k titres de section les plus pertinents.
+        List[Tuple[str, float]]: Couples (titre, score) triés par score décroissant.
     """
-
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
-    
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model.to(device)
-    model.eval()
-
-    scores = []
-
     print(f"🔍 Calcul de la similarité pour la question : {question}")
 
-    for section_title in sections:
-        print(f"Comparaison avec le titre : '{section_title}'")
+    scores = get_reranker(model_name).score(question, sections, batch_size=batch_size).tolist()
+    scored_sections = sorted(zip(sections, scores), key=lambda x: x[1], reverse=True)
 
-        inputs = tokenizer(question, section_title, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
+    for section_title, score in scored_sections:
+        print(f"Titre : '{section_title}' — Score : {score}")
 
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            score = logits[0][1].item() if logits.shape[1] == 2 else logits[0][0].item()
+    return scored_sections
 
-        print(f"Score : {score}")
-        scores.append((score, section_title))
+def find_most_relevant_sections(scored_sections: List[Tuple[str, float]], top_k: int = 3) -> List[str]:
+    """
+    Trouve les sections les plus pertinentes à partir des scores calculés par `score_sections`.
 
-    reranked_sections = [title for score, title in sorted(scores, key=lambda x: x[0], reverse=True)[:top_k]]
+    Args:
+        scored_sections (List[Tuple[str, float]]): Couples (titre, score) triés par score décroissant.
+        top_k (int): Le nombre de sections les plus pertinentes à renvoyer.
+
+    Returns:
+        List[str]: Liste des top-k titres de section les plus pertinents.
+    """
+    reranked_sections = [title for title, _ in scored_sections[:top_k]]
 
     print(f"🔝 Sections les plus pertinentes : {reranked_sections}")
     return reranked_sections
 
-def should_use_section_filter(question: str, sections: List[str], model_name: str, top_diff: float = 1.0) -> bool:
+def should_use_section_filter(scored_sections: List[Tuple[str, float]], top_diff: float = 1.0) -> bool:
     """
     Décide si le filtrage par section est pertinent en comparant le meilleur score au deuxième.
     Cela évite de dépendre d’un seuil absolu de similarité (non fiable sur des logits).
     
     Args:
-        question (str): Question utilisateur.
-        sections (List[str]): Titres de sections.
-        model_name (str): Nom du modèle utilisé.
+        scored_sections (List[Tuple[str, float]]): Couples (titre, score) triés par score décroissant.
         top_diff (float): Différence minimale entre le meilleur et le deuxième score pour déclencher le filtre.
 
     Returns:
         bool: True si filtrage pertinent, sinon False.
     """
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model.to(device)
-    model.eval()
-
-    scores = []
-    for section_title in sections:
-        inputs = tokenizer(question, section_title, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            score = logits[0][1].item() if logits.shape[1] == 2 else logits[0][0].item()
-            scores.append(score)
-
-    sorted_scores = sorted(scores, reverse=True)
+    sorted_scores = [score for _, score in scored_sections]
     logger.info(f"📊 Top 2 scores section: {sorted_scores[:2]}")
     
     if len(sorted_scores) < 2:
@@ -218,94 +254,213 @@ def should_use_section_filter(question: str, sections: List[str], model_name: st
 
     return use_filter
 
-def get_title_documents(documents: List[Document], source) -> List[str]:
+def index_titles_by_source(documents: List[Document]) -> Dict[str, List[str]]:
     """
-    Extrait une liste de titres de sections uniques à partir des documents dont le type est 'title'.
+    Construit en une seule passe, pour chaque document source, la liste triée de ses titres de sections.
     """
-    titres_uniques = set()
+    titres_par_source = defaultdict(set)
 
     for doc in documents:
-        if doc.metadata["source"] == source:
-            titres_uniques.add(doc.metadata["section_title"])
+        titres_par_source[doc.metadata["source"]].add(doc.metadata["section_title"])
 
-    return sorted(titres_uniques)
+    return {source: sorted(titres) for source, titres in titres_par_source.items()}
 
-def poser_question(question, vectorstore, llm, workspace_id, allowed_levels, reranker_model, k=100, top_n_reranked=5, k_neighbors=3, top_k=1) -> dict:
-    logger.info(f"❓ Question posée : {question}")
+def fetch_section_titles(weaviate_client, hash: str, limit: int = 10000) -> List[str]:
+    """
+    Titres de sections d'un document indexé (tous ses chunks, pas seulement les candidats d'une requête).
+    """
+    result = weaviate_client.query.get("AO", ["section_title"]) \
+        .with_where({"path": ["hash"], "operator": "Equal", "valueText": hash}) \
+        .with_limit(limit) \
+        .do()
+    hits = result.get("data", {}).get("Get", {}).get("AO", []) or []
+    return sorted({hit["section_title"] for hit in hits if hit.get("section_title")})
+
+def get_title_documents(documents: List[Document], source, titles_by_source: Dict[str, List[str]] = None) -> List[str]:
+    """
+    Extrait une liste de titres de sections uniques pour un document source.
+    Si l'index `titles_by_source` est fourni, aucune passe sur les documents n'est refaite.
+    """
+    if titles_by_source is None:
+        titles_by_source = index_titles_by_source(documents)
 
-    try:
-        # 🔢 Nombre total de documents dans la classe 'AO' (toute la base)
-        weaviate_client = vectorstore._client
-        count_result = weaviate_client.query.aggregate("AO").with_meta_count().do()
-        count = count_result['data']['Aggregate']['AO'][0]['meta']['count']
-        logger.info(f"🔢 Nombre de documents dans l'index 'AO' : {count}")
-    
-        # Crée un retriever avec filtre sur workspace et niveaux de confidentialité
-        retriever = vectorstore.as_retriever(search_kwargs={
-            "k": count  # ou un chiffre plus raisonnable si tu veux pas reranker 300 docs à chaque fois
-        })
-        # Recherche vectorielle filtrée
-        docs = retriever.get_relevant_documents(query = question)
-
-        # Étape 2 : filtre à la main sur le workspace_id
-        filtered_docs = [
-            doc for doc in docs if doc.metadata["workspace_id"] == workspace_id and doc.metadata["confidentiality"] in allowed_levels
+    return titles_by_source.get(source, [])
+
+def build_where_filter(workspace_id: str, allowed_levels) -> dict:
+    """
+    Construit le filtre Weaviate (workspace_id + niveaux de confidentialité autorisés)
+    appliqué directement lors de la recherche vectorielle.
+    """
+    levels = [getattr(level, "value", level) for level in allowed_levels]
+    return {
+        "operator": "And",
+        "operands": [
+            {"path": ["workspace_id"], "operator": "Equal", "valueText": workspace_id},
+            {"path": ["confidentiality"], "operator": "ContainsAny", "valueTextArray": levels}
         ]
-        docs = filtered_docs[:k]
-        logger.info(f"🔍 {len(docs)} document(s) trouvé(s) après filtrage vectoriel.")
-        source = docs[0].metadata["source"]
-        sections = get_title_documents(docs, source)
-
-        if should_use_section_filter(question, sections, reranker_model):
-            reranked_sections = find_most_relevant_sections(question, sections, reranker_model, top_k)
-            docs = [
-                doc for doc in docs if doc.metadata["section_title"] in reranked_sections
-            ]
-            logger.info(f"🔍 {len(docs)} document(s) trouvé(s) après filtrage sections.")
+    }
+
+def select_documents(question: str, docs: List[Document], reranker_model, top_n_reranked: int = 5, top_k: int = 1, sections: List[str] = None) -> List[Document]:
+    """
+    Étape CPU du pipeline : filtrage par section (si pertinent) puis reranking des candidats.
+    `sections` : titres de sections du document du premier candidat (voir SectionTitleCache) ;
+    à défaut, relevés parmi les candidats.
+    Retourne les top documents rerankés (liste vide si rien de pertinent).
+    """
+    if sections is None:
+        sections = get_title_documents(docs, docs[0].metadata["source"])
+
+    # Un seul passage du cross-encoder sur les titres : sert au filtrage et à la sélection
+    scored_sections = score_sections(question, sections, reranker_model)
+
+    if should_use_section_filter(scored_sections):
+        reranked_sections = find_most_relevant_sections(scored_sections, top_k)
+        filtered = [
+            doc for doc in docs if doc.metadata["section_title"] in reranked_sections
+        ]
+        logger.info(f"🔍 {len(filtered)} document(s) trouvé(s) après filtrage sections.")
+        # Section retenue sans chunk parmi les candidats : le filtrage est ignoré plutôt que de tout écarter
+        if filtered:
+            docs = filtered
         else:
-            logger.info(f"📭 Filtrage par section ignoré (aucune section n'est suffisamment pertinente).")
+            logger.info("📭 Aucun candidat dans les sections retenues : filtrage par section ignoré.")
+    else:
+        logger.info(f"📭 Filtrage par section ignoré (aucune section n'est suffisamment pertinente).")
 
-        if not docs:
-            logger.warning("Aucun document trouvé après filtrage.")
-            return {"response": "Aucun document pertinent trouvé.", "sources": []}
+    if not docs:
+        logger.warning("Aucun document trouvé après filtrage.")
+        return []
+
+    # Reranking
+    reranked_docs = rerank_documents(question, docs, reranker_model, top_n_reranked)
+    logger.info(f"🔍 {len(reranked_docs[:top_n_reranked])} document(s) trouvé(s) après reranking.")
+
+    if not reranked_docs:
+        logger.warning("Aucun document pertinent trouvé après reranking.")
+        return []
+
+    logger.info(f"🔝 Reranked docs: {[ (doc.metadata['source'], doc.metadata['chunk_index']) for doc in reranked_docs ]}")
+    return reranked_docs
+
+def build_prompt(contexte: str, question: str) -> str:
+    return (
+        f"Tu es un assistant intelligent. Tu dois répondre en français à la question suivante en t'appuyant **exclusivement** sur le texte fourni. "
+        f"Ne mélange pas les sources fournies et ne complète jamais avec des connaissances extérieures.\n\n"
+        f"### Contexte :\n{contexte}\n"
+        f"### Question :\n{question}\n"
+        f"### Réponse :"
+    )
+
+def format_sources(enriched_chunks: List[Document]) -> List[dict]:
+    return [
+        {
+            "source": doc.metadata["source"],
+            "section": doc.metadata["section_title"],
+            "chunk_index": doc.metadata["chunk_index"],
+            "content": doc.page_content
+        }
+        for doc in enriched_chunks
+    ]
+
+def poser_question(question, vectorstore, llm, workspace_id, allowed_levels, reranker_model, **retrieval_kwargs) -> dict:
+    """
+    Version synchrone de `aposer_question`, pour les appels hors boucle d'événements (scripts, notebooks).
+    """
+    return asyncio.run(aposer_question(question, vectorstore, llm, workspace_id, allowed_levels, reranker_model, **retrieval_kwargs))
+
+async def apreparer_contexte(question, vectorstore, workspace_id, allowed_levels, reranker_model, executor: Executor = None, k=100, top_n_reranked=5, k_neighbors=3, top_k=1, neighbors_from_store=True, query_vector: List[float] = None, title_cache: SectionTitleCache = None) -> Optional[Tuple[str, List[Document]]]:
+    """
+    Partie récupération du pipeline asynchrone (recherche, filtrage, reranking, enrichissement),
+    sans aucun appel bloquant sur la boucle d'événements :
+    - embedding de la question via `aembed_query` (client HTTP asynchrone de langchain_ollama) ;
+    - requêtes Weaviate (client synchrone) déportées dans le pool de threads par défaut ;
+    - scoring cross-encoder (CPU) exécuté dans `executor`, un pool borné dédié au reranking.
+
+    `neighbors_from_store` (actif par défaut) : les voisins des chunks retenus sont récupérés dans
+    Weaviate, et non seulement parmi les `k` candidats de la recherche vectorielle.
+    `query_vector` permet de réutiliser un embedding de la question déjà calculé (ex. cache de réponses).
+    `title_cache` : titres de sections par document, partagés entre les requêtes (chargés une fois depuis Weaviate).
+    Retourne (contexte, chunks enrichis), ou None si aucun document pertinent.
+    """
+    loop = asyncio.get_running_loop()
+
+    where_filter = build_where_filter(workspace_id, allowed_levels)
+    if query_vector is None:
+        query_vector = await vectorstore.embeddings.aembed_query(question)
+    docs = await asyncio.to_thread(vectorstore.similarity_search_by_vector, query_vector, k=k, where_filter=where_filter)
+    logger.info(f"🔍 {len(docs)} document(s) trouvé(s) après filtrage vectoriel.")
+
+    if not docs:
+        logger.warning("Aucun document trouvé pour ce workspace.")
+        return None
+
+    sections = None
+    if title_cache is not None:
+        source, hash = docs[0].metadata["source"], docs[0].metadata["hash"]
+        sections = await asyncio.to_thread(title_cache.titles, source, hash, lambda h: fetch_section_titles(vectorstore._client, h))
+
+    reranked_docs = await loop.run_in_executor(executor, select_documents, question, docs, reranker_model, top_n_reranked, top_k, sections)
+    if not reranked_docs:
+        return None
+
+    contexte, enriched_chunks = await asyncio.to_thread(
+        build_context,
+        reranked_docs,
+        all_chunks=docs,
+        k_neighbors=k_neighbors,
+        weaviate_client=vectorstore._client if neighbors_from_store else None,
+        where_filter=where_filter
+    )
+    logger.info(f"🔍 {len(enriched_chunks)} document(s) trouvé(s) après enrichissement.")
+    return contexte, enriched_chunks
 
-        # Reranking
-        reranked_docs = rerank_documents(question, docs, reranker_model, top_n_reranked)
-        logger.info(f"🔍 {len(reranked_docs[:top_n_reranked])} document(s) trouvé(s) après reranking.")
+async def aposer_question(question, vectorstore, llm, workspace_id, allowed_levels, reranker_model, executor: Executor = None, **retrieval_kwargs) -> dict:
+    """
+    Pipeline de question asynchrone : récupération via `apreparer_contexte`, génération via `llm.ainvoke`.
+    """
+    logger.info(f"❓ Question posée : {question}")
 
-        if not reranked_docs:
-            logger.warning("Aucun document pertinent trouvé après reranking.")
+    try:
+        prepared = await apreparer_contexte(question, vectorstore, workspace_id, allowed_levels, reranker_model, executor, **retrieval_kwargs)
+        if prepared is None:
             return {"response": "Aucun document pertinent trouvé.", "sources": []}
+        contexte, enriched_chunks = prepared
 
-        logger.info(f"🔝 Reranked docs: {[ (doc.metadata['source'], doc.metadata['chunk_index']) for doc in reranked_docs ]}")
-
-        # Enrichissement de contexte (optionnel)
-        contexte, enriched_chunks = build_context(reranked_docs, all_chunks=filtered_docs, k_neighbors=k_neighbors)
-        logger.info(f"🔍 {len(enriched_chunks)} document(s) trouvé(s) après enrichissement.")
-
-        # Génération finale
-        prompt = (
-            f"Tu es un assistant intelligent. Tu dois répondre en français à la question suivante en t'appuyant **exclusivement** sur le texte fourni. "
-            f"Ne mélange pas les sources fournies et ne complète jamais avec des connaissances extérieures.\n\n"
-            f"### Contexte :\n{contexte}\n"
-            f"### Question :\n{question}\n"
-            f"### Réponse :"
-        )
-        response = llm.invoke(prompt)
-
-        sources = [
-            {
-                "source": doc.metadata["source"],
-                "section": doc.metadata["section_title"],
-                "chunk_index": doc.metadata["chunk_index"],
-                "content": doc.page_content
-            }
-            for doc in enriched_chunks
-        ]
+        response = await llm.ainvoke(build_prompt(contexte, question))
 
         logger.info(f"✅ Réponse générée : {response[:100]}...")
-        return {"response": response, "sources": sources}
+        return {"response": response, "sources": format_sources(enriched_chunks)}
+
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement de la question : {e}")
+        return {"response": MESSAGE_ERREUR, "sources": []}
+
+async def astream_question(question, vectorstore, llm, workspace_id, allowed_levels, reranker_model, executor: Executor = None, **retrieval_kwargs) -> AsyncIterator[dict]:
+    """
+    Variante streaming de `aposer_question`. Produit des événements {"event": ..., "data": ...} :
+    - "sources" : la liste des sources, dès que la récupération et le reranking sont terminés ;
+    - "token" : chaque fragment de réponse, au fil de la génération (`llm.astream`) ;
+    - "error" : en cas d'échec ;
+    - "done" : fin du flux.
+    """
+    logger.info(f"❓ Question posée (streaming) : {question}")
+
+    try:
+        prepared = await apreparer_contexte(question, vectorstore, workspace_id, allowed_levels, reranker_model, executor, **retrieval_kwargs)
+        if prepared is None:
+            yield {"event": "sources", "data": []}
+            yield {"event": "token", "data": "Aucun document pertinent trouvé."}
+            yield {"event": "done", "data": ""}
+            return
+        contexte, enriched_chunks = prepared
+
+        yield {"event": "sources", "data": format_sources(enriched_chunks)}
+
+        async for token in llm.astream(build_prompt(contexte, question)):
+            yield {"event": "token", "data": token}
 
     except Exception as e:
         logger.error(f"Erreur lors du traitement de la question : {e}")
-        return {"response": "Une erreur s'est produite lors du traitement de la question.", "sources": []}
\ No newline at end of file
+        yield {"event": "error", "data": MESSAGE_ERREUR}
+
+    yield {"event": "done", "data": ""}
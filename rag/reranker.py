@@ -0,0 +1,124 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import torch
+
+logger = logging.getLogger(__name__)
+
+def default_device() -> str:
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def default_dtype(device: str) -> torch.dtype:
+    # float16 uniquement sur GPU : sur CPU la demi-précision est plus lente et moins précise
+    return torch.float16 if device.startswith("cuda") else torch.float32
+
+class CrossEncoderReranker:
+    """
+    Cross-encoder chargé une seule fois (tokenizer + modèle) et partagé entre les requêtes.
+    L'inférence est protégée par un verrou : un même modèle n'est jamais appelé
+    par deux threads en même temps.
+    Les paires (query, passage) sont scorées par micro-batchs avec padding dynamique.
+    """
+
+    def __init__(self, model_name: str, device: str, dtype: torch.dtype, max_length: int = 512, batch_size: int = 32):
+        self.model_name = model_name
+        self.device = device
+        self.dtype = dtype
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name, torch_dtype=dtype)
+        self.model.to(device)
+        self.model.eval()
+        self._lock = threading.Lock()
+
+    def score(self, query: str, passages: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Retourne un vecteur NumPy de scores de pertinence, dans l'ordre des passages.
+
+        Les passages sont triés par longueur avant d'être regroupés en micro-batchs :
+        chaque batch est paddé à la longueur de son plus long élément, donc des passages
+        de taille voisine limitent le padding inutile.
+        """
+        batch_size = batch_size or self.batch_size
+        scores = np.empty(len(passages), dtype=np.float32)
+        if not passages:
+            return scores
+
+        order = sorted(range(len(passages)), key=lambda i: len(passages[i]))
+
+        with self._lock, torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                batch_idx = order[start:start + batch_size]
+                inputs = self.tokenizer(
+                    [query] * len(batch_idx),
+                    [passages[i] for i in batch_idx],
+                    return_tensors="pt",
+                    padding="longest",
+                    truncation=True,
+                    max_length=self.max_length
+                ).to(self.device)
+                logits = self.model(**inputs).logits.float()
+                # 1 logit (MS-MARCO, BGE) ou 2 logits (classe "pertinent" en position 1)
+                batch_scores = logits[:, 0] if logits.shape[1] == 1 else logits[:, 1]
+                scores[batch_idx] = batch_scores.cpu().numpy()
+
+        return scores
+
+class RerankerRegistry:
+    """
+    Registre process-wide des cross-encoders, indexé par (nom du modèle, device, dtype).
+    Chaque modèle n'est chargé qu'une fois ; plusieurs modèles peuvent cohabiter,
+    ce qui permet de basculer de l'un à l'autre sans redémarrer l'API.
+    """
+
+    def __init__(self, batch_size: int = 32):
+        self.batch_size = batch_size
+        self._models: Dict[Tuple[str, str, torch.dtype], CrossEncoderReranker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, device: Optional[str] = None, dtype: Optional[torch.dtype] = None) -> CrossEncoderReranker:
+        device = device or default_device()
+        dtype = dtype or default_dtype(device)
+        key = (model_name, device, dtype)
+
+        reranker = self._models.get(key)
+        if reranker is not None:
+            return reranker
+
+        with self._lock:
+            # Double vérification : un autre thread a pu charger le modèle entre-temps
+            reranker = self._models.get(key)
+            if reranker is None:
+                logger.info(f"📦 Chargement du reranker {model_name} ({device}, {dtype})")
+                reranker = CrossEncoderReranker(model_name, device, dtype, batch_size=self.batch_size)
+                self._models[key] = reranker
+        return reranker
+
+    def unload(self, model_name: str) -> int:
+        """
+        Décharge toutes les variantes (device, dtype) d'un modèle. Retourne le nombre de variantes retirées.
+        """
+        with self._lock:
+            keys = [key for key in self._models if key[0] == model_name]
+            for key in keys:
+                del self._models[key]
+        if keys and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return len(keys)
+
+    def loaded_models(self) -> List[str]:
+        return sorted({key[0] for key in self._models})
+
+# Registre partagé par tout le process
+reranker_registry = RerankerRegistry()
+
+def get_reranker(model: Union[str, CrossEncoderReranker]) -> CrossEncoderReranker:
+    """
+    Accepte un nom de modèle ou un reranker déjà chargé.
+    """
+    if isinstance(model, CrossEncoderReranker):
+        return model
+    return reranker_registry.get(model)
@@ -0,0 +1,79 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class SummaryCache:
+    """
+    Cache persistant (SQLite) des résumés LLM, adressé par contenu.
+
+    La clé est le SHA-256 de (texte normalisé du chunk, version du prompt, nom du modèle) :
+    un même extrait (CCAP/RC réutilisé, tender révisé) n'est résumé qu'une fois, tant que
+    le prompt et le modèle ne changent pas. La taille est bornée à `max_entries` résumés :
+    au dépassement, les moins récemment utilisés sont évincés par lot, jusqu'à `eviction_ratio`
+    de la borne. Le nombre de lignes est suivi en mémoire (pas de COUNT(*) à chaque ajout).
+
+    Les accès sont bloquants (SQLite) : depuis la boucle d'événements, passer par un thread.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000, eviction_ratio: float = 0.9):
+        self.path = path
+        self.max_entries = max_entries
+        self.eviction_ratio = eviction_ratio
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, summary TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_summaries_last_access ON summaries (last_access)")
+        self._conn.commit()
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, prompt_version: str, model_name: str) -> str:
+        # Normalisation : les différences d'espaces/sauts de ligne ne changent pas le résumé
+        normalized = re.sub(r"\s+", " ", text).strip()
+        return hashlib.sha256(f"{prompt_version}\0{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO summaries (key, summary, last_access) VALUES (?, ?, ?)",
+                (key, summary, time.time())
+            )
+            if cursor.rowcount:
+                self._count += 1
+            else:
+                self._conn.execute("UPDATE summaries SET summary = ?, last_access = ? WHERE key = ?", (summary, time.time(), key))
+            if self._count > self.max_entries:
+                excess = self._count - int(self.max_entries * self.eviction_ratio)
+                self._conn.execute(
+                    "DELETE FROM summaries WHERE key IN (SELECT key FROM summaries ORDER BY last_access LIMIT ?)",
+                    (excess,)
+                )
+                self._count -= excess
+                logger.info(f"🧹 {excess} résumé(s) évincé(s) du cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count}
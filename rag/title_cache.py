@@ -0,0 +1,49 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SectionTitleCache:
+    """
+    Titres de sections de chaque document indexé, par (source, hash), partagés par toutes les requêtes.
+
+    Un hash identifie une version figée du document : ses titres ne changent pas tant qu'il est indexé.
+    Les titres sont chargés depuis le store au premier besoin (`charger`), puis servis de la mémoire.
+    Éviction LRU (`max_entries` documents). Une ingestion retire les entrées de la source concernée
+    (anciennes versions remplacées).
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._titres: "OrderedDict[Tuple[str, str], List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def titles(self, source: str, hash: str, charger: Callable[[str], List[str]]) -> List[str]:
+        """Titres triés du document `hash` ; `charger(hash)` n'est appelé qu'en cas d'absence."""
+        key = (source, hash)
+        with self._lock:
+            if key in self._titres:
+                self._titres.move_to_end(key)
+                self.hits += 1
+                return self._titres[key]
+            self.misses += 1
+
+        titres = sorted(set(charger(hash)))
+        with self._lock:
+            self._titres[key] = titres
+            while len(self._titres) > self.max_entries:
+                self._titres.popitem(last=False)
+        return titres
+
+    def invalidate_source(self, source: str):
+        with self._lock:
+            for key in [key for key in self._titres if key[0] == source]:
+                del self._titres[key]
+        logger.info(f"🧹 Titres de sections invalidés pour {source}")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._titres)}
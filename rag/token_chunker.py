@@ -0,0 +1,183 @@
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+from transformers import AutoTokenizer
+
+# Points de coupe : fin de phrase suivie d'espaces, ou saut(s) de ligne. Les séparateurs restent
+# attachés à l'unité qui précède, si bien que la concaténation des unités redonne le texte exact
+_RE_COUPURE = re.compile(r'(?<=[.!?])[ \t]+|\n+')
+
+class TokenCounter:
+    """
+    Compte les tokens avec le tokenizer rapide d'un modèle, par lots.
+    Les comptes sont mis en cache (LRU borné à `max_entries`, clé : SHA-256 du texte) :
+    un même passage n'est tokenisé qu'une fois par modèle.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 100000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        keys = [self._key(text) for text in texts]
+        counts = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    counts[key] = self._cache[key]
+        self.hits += len(counts)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in counts}
+        if missing:
+            # Un seul appel au tokenizer (Rust) pour tous les textes absents du cache
+            encoded = self.tokenizer(
+                list(missing.values()),
+                add_special_tokens=False,
+                return_attention_mask=False,
+                return_token_type_ids=False
+            )["input_ids"]
+            computed = {key: len(ids) for key, ids in zip(missing, encoded)}
+            self.misses += len(computed)
+            counts.update(computed)
+            with self._lock:
+                self._cache.update(computed)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        return [counts[key] for key in keys]
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+class TokenChunker:
+    """
+    Découpage en chunks mesurés en tokens, sous le budget de chaque modèle qui les consomme :
+    `budgets` = {nom du modèle (tokenizer HF) : nombre maximal de tokens par chunk}.
+
+    Le texte est coupé en unités (phrases, lignes), comptées en lot pour chaque modèle, puis
+    regroupées tant que tous les budgets sont respectés. `overlap` tokens (au plus) sont repris
+    d'un chunk au suivant. Une unité plus longue qu'un budget est elle-même coupée par mots,
+    ou aux frontières de tokens si elle ne contient qu'un mot.
+    """
+
+    def __init__(self, budgets: Dict[str, int], overlap: int = 32, max_entries: int = 100000):
+        self.budgets = dict(budgets)
+        self.overlap = overlap
+        self.counters = {model_name: TokenCounter(model_name, max_entries=max_entries) for model_name in self.budgets}
+
+    def _counts(self, texts: List[str]) -> List[Dict[str, int]]:
+        par_modele = {model_name: counter.count_many(texts) for model_name, counter in self.counters.items()}
+        return [{model_name: par_modele[model_name][i] for model_name in self.counters} for i in range(len(texts))]
+
+    def _depassement(self, counts: Dict[str, int]) -> float:
+        """Rapport au budget le plus contraint (> 1 : l'unité ne tient pas dans un chunk)."""
+        return max(counts[model_name] / budget for model_name, budget in self.budgets.items())
+
+    def _unites(self, text: str) -> List[str]:
+        unites = []
+        debut = 0
+        for coupure in _RE_COUPURE.finditer(text):
+            unites.append(text[debut:coupure.end()])
+            debut = coupure.end()
+        if debut < len(text):
+            unites.append(text[debut:])
+        return [unite for unite in unites if unite.strip()]
+
+    def _decouper_par_mots(self, unite: str, counts: Dict[str, int]) -> List[str]:
+        # Découpage par mots en parts égales, avec marge : les frontières de mots ajoutent quelques tokens
+        mots = unite.split()
+        nb_parts = min(len(mots), math.ceil(self._depassement(counts) * 1.1))
+        taille = math.ceil(len(mots) / nb_parts)
+        return [" ".join(mots[i:i + taille]) + " " for i in range(0, len(mots), taille)]
+
+    def _decouper_par_tokens(self, unite: str, counts: Dict[str, int]) -> List[str]:
+        # Un seul "mot" trop long (URL, base64, points de suite) : coupe aux frontières de tokens
+        # du modèle le plus contraint, en parts égales avec marge
+        model_name = max(self.budgets, key=lambda m: counts[m] / self.budgets[m])
+        offsets = self.counters[model_name].tokenizer(
+            unite, add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        nb_parts = min(len(offsets), math.ceil(self._depassement(counts) * 1.1))
+        taille = math.ceil(len(offsets) / nb_parts)
+        debuts = [0] + [offsets[i][0] for i in range(taille, len(offsets), taille)] + [len(unite)]
+        return [unite[debut:fin] for debut, fin in zip(debuts, debuts[1:]) if unite[debut:fin].strip()]
+
+    def _decouper_unite(self, unite: str, counts: Dict[str, int]) -> List[str]:
+        if len(unite.split()) > 1:
+            return self._decouper_par_mots(unite, counts)
+        return self._decouper_par_tokens(unite, counts)
+
+    def split_text(self, text: str) -> List[str]:
+        unites = self._unites(text)
+        if not unites:
+            return []
+        counts = self._counts(unites)
+
+        # Unités trop longues pour un chunk : coupées puis recomptées (en lot), jusqu'à ce que tout tienne
+        # (une part coupée par mots peut encore contenir un mot trop long, coupé au tour suivant)
+        while any(self._depassement(c) > 1 for c in counts):
+            decoupees = []
+            for unite, c in zip(unites, counts):
+                decoupees.extend(self._decouper_unite(unite, c) if self._depassement(c) > 1 else [unite])
+            if len(decoupees) == len(unites):
+                break  # plus rien de sécable
+            unites = decoupees
+            counts = self._counts(unites)
+
+        chunks = []
+        courant: List[int] = []
+        totaux = dict.fromkeys(self.budgets, 0)
+
+        def ajouter(i: int):
+            courant.append(i)
+            for model_name in totaux:
+                totaux[model_name] += counts[i][model_name]
+
+        for i in range(len(unites)):
+            if courant and any(totaux[m] + counts[i][m] > self.budgets[m] for m in self.budgets):
+                chunks.append("".join(unites[j] for j in courant).strip())
+                # Chevauchement : dernières unités du chunk, dans la limite de `overlap` tokens par modèle
+                reprises = []
+                reprise = dict.fromkeys(self.budgets, 0)
+                for j in reversed(courant):
+                    if any(reprise[m] + counts[j][m] > self.overlap for m in self.budgets):
+                        break
+                    reprises.insert(0, j)
+                    for m in reprise:
+                        reprise[m] += counts[j][m]
+                courant.clear()
+                totaux = dict.fromkeys(self.budgets, 0)
+                for j in reprises:
+                    ajouter(j)
+                # La reprise ne doit pas empêcher l'unité courante d'entrer
+                if any(totaux[m] + counts[i][m] > self.budgets[m] for m in self.budgets):
+                    courant.clear()
+                    totaux = dict.fromkeys(self.budgets, 0)
+            ajouter(i)
+
+        if courant:
+            chunks.append("".join(unites[j] for j in courant).strip())
+        return [chunk for chunk in chunks if chunk]
+
+    def token_counts(self, chunks: List[str]) -> Dict[str, List[int]]:
+        """Nombre de tokens de chaque chunk pour chaque modèle (comptes mis en cache)."""
+        return {model_name: counter.count_many(chunks) for model_name, counter in self.counters.items()}
+
+    def stats(self) -> dict:
+        return {
+            model_name: {"budget": self.budgets[model_name], "hits": counter.hits, "misses": counter.misses, "entries": len(counter._cache)}
+            for model_name, counter in self.counters.items()
+        }
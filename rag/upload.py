@@ -0,0 +1,129 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Optional
+
+class SpooledUpload:
+    """
+    Fichier reçu par blocs : gardé en mémoire jusqu'à `max_memory` octets, puis déversé
+    dans un fichier temporaire sur disque. Le SHA-256 est calculé au fil de l'écriture,
+    sans relire le contenu.
+
+    Le contenu se relit sans copie via `stream()` (buffer mémoire partagé ou fichier disque).
+    """
+
+    def __init__(self, filename: str, max_memory: int = 16 * 1024 * 1024):
+        self.filename = filename
+        self.max_memory = max_memory
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._memory: Optional[io.BytesIO] = io.BytesIO()
+        self._disk = None
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def path(self) -> Optional[str]:
+        """Chemin du fichier temporaire si le contenu a débordé sur disque, sinon None."""
+        return self._disk.name if self._disk is not None else None
+
+    def write(self, block: bytes):
+        if self._disk is None and self.size + len(block) > self.max_memory:
+            self._disk = tempfile.NamedTemporaryFile(prefix="upload_", delete=False)
+            self._disk.write(self._memory.getbuffer())
+            self._memory = None
+        (self._disk or self._memory).write(block)
+        self._sha256.update(block)
+        self.size += len(block)
+
+    def stream(self) -> BinaryIO:
+        """
+        Flux binaire positionné au début du contenu. En mémoire, le BytesIO retourné partage
+        le buffer existant (pas de copie) ; sur disque, c'est un nouveau descripteur en lecture.
+        """
+        if self._disk is not None:
+            self._disk.flush()
+            return open(self._disk.name, "rb")
+        return io.BytesIO(self._memory.getvalue())
+
+    def getvalue(self) -> bytes:
+        """Contenu complet en bytes (copie si le fichier est sur disque)."""
+        if self._disk is not None:
+            with self.stream() as f:
+                return f.read()
+        return self._memory.getvalue()
+
+    def persist(self, path: str) -> "StoredUpload":
+        """
+        Écrit le contenu à `path` (déplacement du fichier temporaire s'il est déjà sur disque)
+        et renvoie l'upload persisté correspondant. L'upload spoolé est ensuite vide.
+        """
+        if self._disk is not None:
+            self._disk.close()
+            shutil.move(self._disk.name, path)
+            self._disk = None
+        else:
+            with open(path, "wb") as f:
+                f.write(self._memory.getbuffer())
+        self._memory = None
+        return StoredUpload(path, self.filename, self.sha256)
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+            os.remove(self._disk.name)
+            self._disk = None
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class StoredUpload:
+    """
+    Upload déjà persisté sur disque (ex. fichier d'un job d'ingestion), même interface que `SpooledUpload`.
+    """
+
+    def __init__(self, path: str, filename: str, sha256: str):
+        self.path = path
+        self.filename = filename
+        self.sha256 = sha256
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def stream(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def getvalue(self) -> bytes:
+        with self.stream() as f:
+            return f.read()
+
+    def close(self):
+        # Le fichier appartient à son propriétaire (ex. le job), qui le supprime lui-même
+        pass
+
+async def spool_upload(file, block_size: int = 1024 * 1024, max_memory: int = 16 * 1024 * 1024) -> SpooledUpload:
+    """
+    Lit un UploadFile par blocs de `block_size` octets dans un `SpooledUpload`.
+    La mémoire utilisée reste bornée par `max_memory`, quelle que soit la taille du fichier.
+    """
+    upload = SpooledUpload(file.filename, max_memory=max_memory)
+    try:
+        while True:
+            block = await file.read(block_size)
+            if not block:
+                break
+            upload.write(block)
+    except BaseException:
+        # Réception interrompue : le fichier temporaire éventuel est supprimé
+        upload.close()
+        raise
+    return upload